@@ -0,0 +1,13 @@
+"""Run the API: python -m backend
+
+Prefer this (or `uvicorn backend.main:app`) over `python backend/main.py`. PDF extraction
+uses spawned worker processes, and spawn re-imports the parent's __main__ in every worker;
+this module is safe to re-import, while main.py would build a FastAPI app plus Gemini and
+Qdrant clients in each of them.
+"""
+import os
+
+import uvicorn
+
+if __name__ == "__main__":
+    uvicorn.run("backend.main:app", host="0.0.0.0", port=int(os.environ.get("PORT", 8001)))
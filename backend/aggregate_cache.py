@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+AGG_CACHE_ENABLED = os.getenv("AGG_CACHE_ENABLED", "1") == "1"
+AGG_CACHE_MAX_ENTRIES = int(os.getenv("AGG_CACHE_MAX_ENTRIES", "2000"))
+
+
+def _normalize_name(name):
+    return str(name).strip().strip('"').lower()
+
+
+_LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+
+
+def _normalize_where(where):
+    """Dict filters compare case-insensitively on both engines, so keys and values are lower-cased.
+
+    String clauses can hold range comparisons, which SQLite evaluates case-sensitively, so only
+    whitespace and identifier/keyword case are normalized; quoted literals are kept as written.
+    """
+    if isinstance(where, dict):
+        return sorted((_normalize_name(k), str(v).strip().lower()) for k, v in where.items())
+    if isinstance(where, str):
+        parts = _LITERAL_RE.split(where.strip())
+        return "".join(part if i % 2 else re.sub(r"\s+", " ", part).lower() for i, part in enumerate(parts))
+    return None
+
+
+def cache_key(table_name, aggregations, group_by=None, where=None, distinct=False, offset=0, limit=None):
+    """Canonical JSON for one aggregate request; column order is kept because it shapes the result."""
+    return json.dumps(
+        {
+            "aggregations": [
+                [str(a.get("operation", "")).upper(), _normalize_name(a.get("column") or "*")] for a in aggregations or []
+            ],
+            "group_by": [" ".join(str(g).split()).lower() for g in group_by or []],
+            "where": _normalize_where(where),
+            "distinct": bool(distinct),
+            "offset": int(offset or 0),
+            "limit": int(limit) if limit else None,
+        },
+        sort_keys=True,
+    )
+
+
+class AggregateCache:
+    """Materialized results of grouped/aggregate get_order_details calls.
+
+    Each table has a version counter that is bumped whenever the table is
+    (re)loaded; entries are stored under the version they were computed at, so
+    a reload makes every older entry for that table unreachable and they are
+    purged eagerly.
+    """
+
+    def __init__(self, max_entries=AGG_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        self._versions = {}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(self, table_name):
+        with self._lock:
+            return self._versions.get(table_name.lower(), 0)
+
+    def get(self, table_name, key):
+        with self._lock:
+            table = table_name.lower()
+            full_key = (table, self._versions.get(table, 0), key)
+            result = self._entries.get(full_key)
+            if result is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.stats["hits"] += 1
+            return result
+
+    def put(self, table_name, key, result, version):
+        """Store a result computed while the table was at `version`; dropped if the table changed since."""
+        with self._lock:
+            table = table_name.lower()
+            if self._versions.get(table, 0) != version:
+                return
+            self._entries[(table, version, key)] = result
+            self._entries.move_to_end((table, version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_table(self, table_name):
+        """Bump the table's version and drop its entries (called whenever a table is replaced)."""
+        with self._lock:
+            table = table_name.lower()
+            version = self._versions[table] = self._versions.get(table, 0) + 1
+            stale = [k for k in self._entries if k[0] == table]
+            for k in stale:
+                del self._entries[k]
+            self.stats["invalidations"] += 1
+        logging.info(f"Aggregate cache: '{table_name}' now at version {version}, dropped {len(stale)} entries")
+
+    def clear(self):
+        with self._lock:
+            for table in self._versions:
+                self._versions[table] += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+aggregate_cache = AggregateCache()
+
+
+def cached_aggregate(table_name, aggregations, group_by, where, distinct, offset, limit, compute):
+    """Serve an aggregate request from the cache, or run compute() and remember list results."""
+    if not AGG_CACHE_ENABLED:
+        return compute()
+    key = cache_key(table_name, aggregations, group_by, where, distinct, offset, limit)
+    result = aggregate_cache.get(table_name, key)
+    if result is not None:
+        return result
+    from backend.sql_handler import ResultPage
+
+    version = aggregate_cache.version(table_name)
+    result = compute()
+    # Only real, non-empty result sets are cached: strings are "please upload" / error messages,
+    # and execute_sql_query reports a failed query (e.g. "database is locked") as an empty page.
+    if isinstance(result, ResultPage) and result:
+        aggregate_cache.put(table_name, key, result, version)
+    return result
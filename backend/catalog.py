@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from backend import db_pool
+from backend.dates import detect_date_format, is_derived
+from backend.functions import table_metadata as static_metadata
+
+CATALOG_TABLE = "_catalog"
+CATALOG_SAMPLE_ROWS = int(os.getenv("CATALOG_SAMPLE_ROWS", "10000"))
+CATALOG_SAMPLE_VALUES = int(os.getenv("CATALOG_SAMPLE_VALUES", "3"))
+# Upper bounds on what one prompt carries, however many sheets have been uploaded.
+CATALOG_MAX_TABLES = int(os.getenv("CATALOG_MAX_TABLES", "3"))
+CATALOG_MAX_COLUMNS = int(os.getenv("CATALOG_MAX_COLUMNS", "25"))
+
+_SQL_TYPES = {"INTEGER": "int", "REAL": "float", "TEXT": "string"}
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_cache = None
+_cache_lock = threading.Lock()
+version = 0
+
+
+def _words(text):
+    return {w[:-1] if len(w) > 3 and w.endswith("s") else w for w in _WORD_RE.findall(str(text).lower())}
+
+
+def _ensure_schema(conn):
+    conn.execute(
+        f"""CREATE TABLE IF NOT EXISTS "{CATALOG_TABLE}" (
+               table_name TEXT PRIMARY KEY,
+               source TEXT,
+               row_count INTEGER NOT NULL,
+               columns TEXT NOT NULL,
+               updated_at REAL NOT NULL
+           )"""
+    )
+
+
+def _static_columns(table_name):
+    for table in static_metadata.get("tables", []):
+        if table["Name"].lower() == table_name.lower():
+            return {c["Name"].lower(): c for c in table.get("Columns", [])}
+    return {}
+
+
+def _describe(column):
+    parts = []
+    if column.get("DateFormat"):
+        parts.append(f"format {column['DateFormat']}")
+    parts.append(f"{column['Distinct']:,} distinct values")
+    if column["Samples"]:
+        parts.append("e.g. " + ", ".join(str(s) for s in column["Samples"]))
+    return "; ".join(parts) + "."
+
+
+def introspect_table(conn, table_name, source=None):
+    """Profile a freshly loaded table and store it in the catalog (same connection, same database)."""
+    from backend.sql_compiler import quote_identifier  # sql_compiler imports catalog
+    start = time.time()
+    # The derived __date/__year/... columns are for the query compiler, not for the model's schema.
+    info = [row for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})") if not is_derived(row[1])]
+    names = [row[1] for row in info]
+    declared = [row[2].upper() for row in info]
+    sample = f"SELECT * FROM {quote_identifier(table_name)} LIMIT {CATALOG_SAMPLE_ROWS}"
+    distinct = ", ".join(f"COUNT(DISTINCT {q}), SUM({q} IS NULL)" for q in map(quote_identifier, names))
+    row_count = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+    profile = conn.execute(f"SELECT {distinct} FROM ({sample})").fetchone() if names else ()
+
+    described = _static_columns(table_name)
+    columns = []
+    for i, (name, sql_type) in enumerate(zip(names, declared)):
+        top = [r[0] for r in conn.execute(
+            f"SELECT {quote_identifier(name)}, COUNT(*) AS n FROM ({sample}) WHERE {quote_identifier(name)} IS NOT NULL "
+            f'GROUP BY 1 ORDER BY n DESC LIMIT 50'
+        )]
+        column = {
+            "Name": name,
+            "Type": _SQL_TYPES.get(sql_type, "string"),
+            "Distinct": profile[2 * i] or 0,
+            "Nulls": profile[2 * i + 1] or 0,
+            "Samples": top[:CATALOG_SAMPLE_VALUES],
+        }
+        if sql_type == "TEXT":
+            fmt, kind = detect_date_format(top)
+            if fmt:
+                column["Type"], column["DateFormat"] = kind, fmt
+        static = described.get(name.lower())
+        # Description is human-written and shown to users; Profile is generated and prompt-only.
+        if static and static.get("Description"):
+            column["Description"] = static["Description"]
+        column["Profile"] = _describe(column)
+        columns.append(column)
+
+    _ensure_schema(conn)
+    conn.execute(
+        f'INSERT OR REPLACE INTO "{CATALOG_TABLE}" VALUES (?, ?, ?, ?, ?)',
+        (table_name, source, row_count, json.dumps(columns, default=str), time.time()),
+    )
+    conn.commit()
+    invalidate()
+    logging.info(f"Catalogued '{table_name}' ({row_count} rows, {len(columns)} columns) in {time.time() - start:.2f}s")
+
+
+def invalidate():
+    global _cache, version
+    with _cache_lock:
+        _cache = None
+        version += 1
+
+
+def _load(db_name):
+    if not os.path.exists(db_name):
+        return []
+    with db_pool.connection(db_name) as conn:
+        _ensure_schema(conn)
+        rows = conn.execute(
+            f'SELECT table_name, source, row_count, columns FROM "{CATALOG_TABLE}" ORDER BY updated_at DESC'
+        ).fetchall()
+    return [
+        {"Name": name, "Source": source, "Rows": row_count, "Columns": json.loads(columns)}
+        for name, source, row_count, columns in rows
+    ]
+
+
+def tables(db_name="data.db"):
+    """Catalogued tables, most recently loaded first."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = _load(db_name)
+            except Exception:
+                logging.exception("Could not read the table catalog")
+                return []
+        return _cache
+
+
+def table_metadata():
+    """Catalog as {"tables": [...]}; falls back to the static functions.json schema before any upload."""
+    catalogued = tables()
+    return {"tables": catalogued} if catalogued else static_metadata
+
+
+def _prompt_column(column):
+    prompt = {k: column[k] for k in ("Name", "Type") if k in column}
+    description = column.get("Description") or column.get("Profile")
+    if description:
+        prompt["Description"] = description
+    return prompt
+
+
+def _prompt_table(table, columns):
+    return {"Name": table["Name"], "Columns": [_prompt_column(c) for c in columns]}
+
+
+def prune_schema(query, max_tables=CATALOG_MAX_TABLES, max_columns=CATALOG_MAX_COLUMNS):
+    """Only the tables and columns relevant to a query, in the shape of functions.json's table_metadata."""
+    metadata = table_metadata()
+    candidates = metadata.get("tables", [])
+    words = _words(query)
+
+    scored = []
+    for position, table in enumerate(candidates):
+        column_hits = {}
+        for c in table.get("Columns", []):
+            hits = len(words & _words(c["Name"])) * 2
+            hits += sum(1 for s in c.get("Samples", ()) if _words(s) and _words(s) <= words)
+            if hits:
+                column_hits[c["Name"]] = hits
+        score = 3 * len(words & _words(table["Name"])) + sum(column_hits.values())
+        scored.append((score, -position, table, column_hits))
+    scored.sort(key=lambda item: item[:2], reverse=True)
+
+    chosen = [item for item in scored if item[0] > 0][:max_tables] or scored[:1]
+    pruned = []
+    for _, _, table, column_hits in chosen:
+        columns = table.get("Columns", [])
+        if len(columns) > max_columns:
+            # Matched, ID and date columns first, then the rest in table order.
+            ranked = sorted(
+                range(len(columns)),
+                key=lambda i: (
+                    columns[i]["Name"] not in column_hits,
+                    not (columns[i].get("DateFormat") or "id" in _words(columns[i]["Name"])),
+                    i,
+                ),
+            )
+            columns = [columns[i] for i in sorted(ranked[:max_columns])]
+        pruned.append(_prompt_table(table, columns))
+    return {"tables": pruned}
@@ -0,0 +1,150 @@
+import os
+import re
+
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "350"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "50"))
+# Chunks shorter than this are merged into their neighbour instead of being embedded alone.
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "40"))
+
+HEADING = "heading"
+TEXT = "text"
+PAGE_BREAK = "page_break"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+_NUMBERED_HEADING_RE = re.compile(r"^(\d+(\.\d+)*\.?|[IVX]+\.|[A-Z]\.)\s+\S")
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate (words and punctuation); close enough for budgeting chunks."""
+    return len(_TOKEN_RE.findall(text))
+
+
+def looks_like_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 100 or line.endswith((".", ",", ";")):
+        return False
+    words = line.split()
+    if len(words) > 12:
+        return False
+    if _NUMBERED_HEADING_RE.match(line):
+        return True
+    if line.isupper() and any(ch.isalpha() for ch in line):
+        return True
+    if line.endswith(":"):
+        return True
+    capitalized = sum(1 for w in words if w[:1].isupper())
+    return len(words) <= 8 and capitalized >= max(1, len(words) - 1)
+
+
+def blocks_from_text(text: str):
+    """Split raw text into (kind, text) blocks: headings, paragraphs and form-feed page breaks."""
+    for p, page in enumerate(text.split("\f")):
+        if p:
+            yield PAGE_BREAK, ""
+        paragraph = []
+        for line in page.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                if paragraph:
+                    yield TEXT, " ".join(paragraph)
+                    paragraph = []
+                continue
+            if looks_like_heading(stripped) and (not paragraph or paragraph[-1].endswith((".", "!", "?", ":"))):
+                if paragraph:
+                    yield TEXT, " ".join(paragraph)
+                    paragraph = []
+                yield HEADING, stripped
+                continue
+            paragraph.append(stripped)
+        if paragraph:
+            yield TEXT, " ".join(paragraph)
+
+
+def split_sentences(text: str):
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+def _split_long(sentence: str, max_tokens: int):
+    """Hard-wrap a single sentence that exceeds the budget on its own."""
+    words = sentence.split()
+    piece, size = [], 0
+    for word in words:
+        n = count_tokens(word)
+        if piece and size + n > max_tokens:
+            yield " ".join(piece)
+            piece, size = [], 0
+        piece.append(word)
+        size += n
+    if piece:
+        yield " ".join(piece)
+
+
+def chunk_blocks(blocks, max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+                 min_tokens=CHUNK_MIN_TOKENS):
+    """Pack sentences into token-budgeted chunks.
+
+    A heading starts a new chunk and is repeated as its first line so the chunk
+    carries its section context. Page breaks end a chunk only when it is already
+    at least half full. Consecutive chunks in the same section share up to
+    overlap_tokens of trailing sentences.
+    """
+    sections = []  # [heading, body] pairs, joined at the end
+    heading = None
+    current, size = [], 0
+    overlap_count = 0  # leading sentences of `current` repeated from the previous chunk
+
+    def emit(keep_overlap):
+        nonlocal current, size, overlap_count
+        fresh = current[overlap_count:]
+        if not fresh:
+            current, size, overlap_count = [], 0, 0
+            return
+        last = sections[-1] if sections else None
+        if last is not None and last[0] == heading and count_tokens(" ".join(fresh)) < min_tokens:
+            last[1] = f"{last[1]} {' '.join(fresh)}"
+        else:
+            sections.append([heading, " ".join(current)])
+        carry, carried = [], 0
+        if keep_overlap and overlap_tokens:
+            for sentence in reversed(current):
+                n = count_tokens(sentence)
+                if carried + n > overlap_tokens:
+                    break
+                carry.insert(0, sentence)
+                carried += n
+        current, size, overlap_count = carry, carried, len(carry)
+
+    for kind, text in blocks:
+        if kind == HEADING:
+            emit(keep_overlap=False)
+            heading = text
+            continue
+        if kind == PAGE_BREAK:
+            if size >= max_tokens // 2:
+                emit(keep_overlap=True)
+            continue
+        for sentence in split_sentences(text):
+            pieces = list(_split_long(sentence, max_tokens)) if count_tokens(sentence) > max_tokens else [sentence]
+            for piece in pieces:
+                n = count_tokens(piece)
+                if current and size + n > max_tokens:
+                    emit(keep_overlap=True)
+                current.append(piece)
+                size += n
+    emit(keep_overlap=False)
+    return [f"{h}\n{body}" if h else body for h, body in sections]
+
+
+def chunk_text(text: str, **kwargs):
+    return chunk_blocks(blocks_from_text(text), **kwargs)
+
+
+def chunk_pages(pages, **kwargs):
+    """Chunk an iterable of page texts, treating page boundaries as soft breaks."""
+    def blocks():
+        for i, page in enumerate(pages):
+            if i:
+                yield PAGE_BREAK, ""
+            yield from blocks_from_text(page)
+    return chunk_blocks(blocks(), **kwargs)
@@ -0,0 +1,494 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend import catalog
+from backend.dates import is_derived
+from backend.sql_compiler import date_condition, parse_where, quote_identifier, unquote_identifier
+
+COLUMNAR_ENABLED = os.getenv("COLUMNAR_ENABLED", "1") == "1"
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "columnar")
+# Tables smaller than this are left to SQLite, which is already fast at that size.
+COLUMNAR_MIN_ROWS = int(os.getenv("COLUMNAR_MIN_ROWS", "10000"))
+COLUMNAR_READ_BATCH = 50000
+
+NUMERIC = "numeric"
+TEXT = "text"
+
+_AGGREGATES = {"SUM", "AVG", "COUNT", "MIN", "MAX"}
+_DATE_PARSE_FORMATS = {
+    "YYYY-MM-DD": "%Y-%m-%d",
+    "YYYY-MM-DD HH:MM:SS": "ISO8601",
+    "YYYY/MM/DD": "%Y/%m/%d",
+    "DD/MM/YYYY": "%d/%m/%Y",
+    "MM/DD/YYYY": "%m/%d/%Y",
+    "DD-MM-YYYY": "%d-%m-%Y",
+    "MM-DD-YYYY": "%m-%d-%Y",
+}
+# Date buckets the routing prompt already teaches the model, plus year()/month()/day() shorthands.
+_STRFTIME_RE = re.compile(r"""^\s*strftime\(\s*'([^']+)'\s*,\s*"?([^"]+?)"?\s*\)\s*$""", re.IGNORECASE)
+_FUNC_RE = re.compile(r"""^\s*(year|month|day|date)\(\s*"?([^"]+?)"?\s*\)\s*$""", re.IGNORECASE)
+_BUCKETS = {"%Y": "year", "%Y-%m": "month", "%m": "month_of_year", "%Y-%m-%d": "day", "%m-%d": "month_day"}
+_NAT = np.iinfo(np.int64).min
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _table_dir(table_name):
+    return os.path.join(COLUMNAR_DIR, table_name)
+
+
+class _ColumnWriter:
+    """Fills one column's .npy file(s) a batch at a time; text is dictionary-encoded incrementally."""
+
+    def __init__(self, directory, entry, dtype, rows):
+        self.entry = entry
+        self.data = np.lib.format.open_memmap(
+            os.path.join(directory, f"{entry['file']}.npy"), mode="w+", dtype=dtype, shape=(rows,)
+        )
+        self.days = None
+        self.codes = {}
+        if entry.get("date_format"):
+            self.days = np.lib.format.open_memmap(
+                os.path.join(directory, f"{entry['file']}.days.npy"), mode="w+", dtype=np.int64, shape=(rows,)
+            )
+
+    def write(self, start, values):
+        end = start + len(values)
+        if self.entry["kind"] == NUMERIC:
+            self.data[start:end] = np.fromiter((np.nan if v is None else v for v in values), np.float64, len(values))
+            return
+        series = pd.Series(values, dtype=object).map(lambda v: None if v is None else str(v))
+        local, uniques = pd.factorize(series)
+        categories = self.entry["categories"]
+        remap = np.empty(len(uniques) + 1, dtype=np.int32)
+        remap[-1] = -1  # pd.factorize marks NULL as -1
+        for j, value in enumerate(uniques):
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(categories)
+                categories.append(value)
+            remap[j] = code
+        self.data[start:end] = remap[local]
+        if self.days is not None:
+            fmt = _DATE_PARSE_FORMATS.get(self.entry["date_format"])
+            parsed = pd.to_datetime(series, format=fmt, errors="coerce")
+            days = parsed.values.astype("datetime64[D]").astype(np.int64)
+            days[parsed.isna().values] = _NAT
+            self.days[start:end] = days
+
+    def close(self):
+        self.data.flush()
+        if self.days is not None:
+            self.days.flush()
+        self.data = self.days = self.codes = None
+
+
+def materialize(conn, table_name):
+    """Write a column-per-file copy of a freshly loaded SQLite table; returns True if one was written.
+
+    Text columns become int32 dictionary codes plus a category list, numeric columns
+    float64 arrays (NaN for NULL), and date columns additionally get an int64
+    day-number array for bucketing.
+    """
+    if not COLUMNAR_ENABLED:
+        return False
+    row_count = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+    if row_count < COLUMNAR_MIN_ROWS:
+        remove(table_name)
+        return False
+
+    start = time.time()
+    described = {
+        c["Name"]: c for t in catalog.tables() if t["Name"] == table_name for c in t["Columns"]
+    }
+    # The __date/__year/... helper columns only serve SQLite's indexes; "days" covers them here.
+    info = [row for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})") if not is_derived(row[1])]
+    names = [row[1] for row in info]
+    declared = [row[2].upper() for row in info]
+
+    tmp = _table_dir(table_name) + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    meta = {"table": table_name, "rows": row_count, "built_at": time.time(), "columns": []}
+    writers = []
+    for i, (name, sql_type) in enumerate(zip(names, declared)):
+        entry = {"name": name, "file": f"c{i}"}
+        if sql_type in ("INTEGER", "REAL"):
+            entry.update(kind=NUMERIC, integer=sql_type == "INTEGER")
+            dtype = np.float64
+        else:
+            entry.update(kind=TEXT, categories=[])
+            dtype = np.int32
+            date_format = described.get(name, {}).get("DateFormat")
+            if date_format:
+                entry["date_format"] = date_format
+        writers.append(_ColumnWriter(tmp, entry, dtype, row_count))
+        meta["columns"].append(entry)
+
+    # Columns are filled batch by batch, so memory stays bounded by one read batch.
+    select = ", ".join(quote_identifier(n) for n in names)
+    cursor = conn.execute(f"SELECT {select} FROM {quote_identifier(table_name)}")
+    written = 0
+    while True:
+        batch = cursor.fetchmany(COLUMNAR_READ_BATCH)
+        if not batch:
+            break
+        if written + len(batch) > row_count:
+            raise RuntimeError(f"'{table_name}' changed while its columnar copy was being built")
+        for writer, values in zip(writers, zip(*batch)):
+            writer.write(written, values)
+        written += len(batch)
+    cursor.close()
+    for writer in writers:
+        writer.close()
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    with _tables_lock:
+        _tables.pop(table_name, None)
+        shutil.rmtree(_table_dir(table_name), ignore_errors=True)
+        os.replace(tmp, _table_dir(table_name))
+    logging.info(f"Materialized columnar copy of '{table_name}' ({row_count} rows) in {time.time() - start:.2f}s")
+    return True
+
+
+def remove(table_name):
+    with _tables_lock:
+        _tables.pop(table_name, None)
+        shutil.rmtree(_table_dir(table_name), ignore_errors=True)
+
+
+def clear():
+    with _tables_lock:
+        _tables.clear()
+        shutil.rmtree(COLUMNAR_DIR, ignore_errors=True)
+
+
+class ColumnTable:
+    """Memory-mapped columns of one table."""
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.name = meta["table"]
+        self.rows = meta["rows"]
+        self.columns = {}
+        for entry in meta["columns"]:
+            column = dict(entry)
+            column["data"] = np.load(os.path.join(path, f"{entry['file']}.npy"), mmap_mode="r")
+            if entry.get("date_format"):
+                column["days"] = np.load(os.path.join(path, f"{entry['file']}.days.npy"), mmap_mode="r")
+            self.columns[entry["name"].lower()] = column
+
+    def column(self, name):
+        return self.columns.get(unquote_identifier(name).lower())
+
+
+def load(table_name):
+    """ColumnTable for a table, or None if no columnar copy exists."""
+    path = _table_dir(table_name)
+    meta_path = os.path.join(path, "meta.json")
+    with _tables_lock:
+        try:
+            mtime = os.path.getmtime(meta_path)
+        except OSError:
+            _tables.pop(table_name, None)
+            return None
+        cached = _tables.get(table_name)
+        if cached is None or cached[0] != mtime:
+            cached = _tables[table_name] = (mtime, ColumnTable(path))
+        return cached[1]
+
+
+class Unsupported(Exception):
+    """The request needs SQL features the columnar engine does not implement."""
+
+
+def _like_regex(pattern):
+    out = []
+    for ch in pattern:
+        out.append(".*" if ch == "%" else "." if ch == "_" else re.escape(ch))
+    return re.compile("^" + "".join(out) + "$", re.IGNORECASE | re.DOTALL)
+
+
+def _text_mask(column, value):
+    categories = column["categories"]
+    if "%" in value or "_" in value:
+        regex = _like_regex(value)
+        wanted = [i for i, c in enumerate(categories) if regex.match(c)]
+    else:
+        wanted = [i for i, c in enumerate(categories) if c.lower() == value.lower()]
+    return np.isin(column["data"], np.array(wanted, dtype=np.int32))
+
+
+_COMPARE = {
+    "=": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal, ">": np.greater, ">=": np.greater_equal,
+}
+
+
+def _day_number(iso):
+    return np.datetime64(iso, "D").astype(np.int64)
+
+
+def _date_mask(days, condition):
+    """Rows matching a sql_compiler.date_condition() term; NULL dates never match, as in SQL."""
+    kind, op, *values = condition
+    valid = days != _NAT
+    if kind == "date":
+        return valid & _COMPARE[op](days, _day_number(values[0]))
+    if kind == "period":
+        start, end = _day_number(values[0]), _day_number(values[1])
+        inside = (days >= start) & (days < end)
+        if op in ("=", "!="):
+            return valid & (inside if op == "=" else ~inside)
+        bound = {"<": (np.less, start), "<=": (np.less, end), ">": (np.greater_equal, end),
+                 ">=": (np.greater_equal, start)}[op]
+        return valid & bound[0](days, bound[1])
+    dates = np.where(valid, days, 0).astype("datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    month = months.astype(np.int64) % 12 + 1
+    day = (dates - months).astype(np.int64) + 1
+    if kind == "month_day":
+        same = (month == values[0]) & (day == values[1])
+        return valid & (same if op == "=" else ~same)
+    return valid & _COMPARE[op](month if kind == "month" else day, values[0])
+
+
+def _where_mask(table, where):
+    """Row mask for a dict whereClause, with the SQL path's semantics (see sql_compiler.parse_where)."""
+    mask = np.ones(table.rows, dtype=bool)
+    if not where:
+        return mask
+    if not isinstance(where, dict):
+        raise Unsupported("string where clause")
+    for predicate in parse_where(where):
+        column = table.column(predicate.column)
+        if column is None:
+            raise Unsupported(f"unknown column {predicate.column}")
+        value = str(predicate.value).strip()
+        if column["kind"] == NUMERIC:
+            try:
+                mask &= column["data"] == float(value)
+            except ValueError:
+                raise Unsupported(f"non-numeric filter on {predicate.column}")
+            continue
+        # Date filters compare parsed days, as SQL does through the derived "<col>__date" columns.
+        condition = date_condition(predicate) if "days" in column else None
+        if condition:
+            mask &= _date_mask(np.asarray(column["days"]), condition)
+        else:
+            mask &= _text_mask(column, value)
+    return mask
+
+
+def _parse_group(table, expression):
+    """(label, column, bucket) for a group_by entry; bucket is None for a plain column."""
+    expression = str(expression)
+    match = _STRFTIME_RE.match(expression)
+    if match:
+        bucket, name = _BUCKETS.get(match.group(1)), match.group(2)
+        if bucket is None:
+            raise Unsupported(f"date bucket {match.group(1)}")
+    else:
+        match = _FUNC_RE.match(expression)
+        if match:
+            bucket, name = match.group(1).lower(), match.group(2)
+            bucket = "day" if bucket == "date" else bucket
+        else:
+            bucket, name = None, expression
+    column = table.column(name)
+    if column is None or (bucket and "days" not in column):
+        raise Unsupported(f"cannot group by {expression}")
+    label = f"{column['name']} ({bucket.replace('_', ' ')})" if bucket else column["name"]
+    return label, column, bucket
+
+
+def _bucket_keys(days, bucket):
+    """Integer bucket keys and a formatter for them."""
+    valid = days != _NAT
+    dates = np.where(valid, days, 0).astype("datetime64[D]")
+    if bucket == "year":
+        keys = dates.astype("datetime64[Y]").astype(np.int64) + 1970
+        fmt = str
+    elif bucket == "month":
+        keys = dates.astype("datetime64[M]").astype(np.int64)
+        fmt = lambda k: str(np.datetime64(int(k), "M"))
+    elif bucket == "month_of_year":
+        keys = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        fmt = lambda k: f"{int(k):02d}"
+    elif bucket == "month_day":
+        months = dates.astype("datetime64[M]")
+        keys = (months.astype(np.int64) % 12 + 1) * 100 + (dates - months).astype(np.int64) + 1
+        fmt = lambda k: f"{int(k) // 100:02d}-{int(k) % 100:02d}"
+    else:
+        keys = days.astype(np.int64)
+        fmt = lambda k: str(np.datetime64(int(k), "D"))
+    return np.where(valid, keys, _NAT), fmt
+
+
+# Above this many possible key combinations, fall back to sorting (np.unique) instead of a dense bincount.
+_DENSE_GROUP_LIMIT = 5000000
+
+
+def _dense_keys(keys):
+    """Map int64 keys (with _NAT for NULL) to codes in [0, size); code 0 is NULL."""
+    valid = keys != _NAT
+    if not valid.any():
+        return np.zeros(len(keys), dtype=np.int64), 1, lambda c: None
+    low, high = int(keys[valid].min()), int(keys[valid].max())
+    if high - low < _DENSE_GROUP_LIMIT:
+        return np.where(valid, keys - low + 1, 0), high - low + 2, lambda c: None if c == 0 else c - 1 + low
+    uniques, codes = np.unique(np.where(valid, keys, low - 1), return_inverse=True)
+    return codes, len(uniques), lambda c: None if uniques[c] == low - 1 else int(uniques[c])
+
+
+def _group_codes(column, bucket, mask):
+    """(codes, size, decode): int codes in [0, size) per selected row and a code -> display value function."""
+    if bucket:
+        keys, fmt = _bucket_keys(np.asarray(column["days"])[mask], bucket)
+        codes, size, key_of = _dense_keys(keys)
+        return codes, size, lambda c: None if key_of(c) is None else fmt(key_of(c))
+    data = np.asarray(column["data"])[mask]
+    if column["kind"] == TEXT:
+        # Dictionary codes are already dense; shift by one so NULL (-1) becomes code 0.
+        categories = column["categories"]
+        return data.astype(np.int64) + 1, len(categories) + 1, lambda c: None if c == 0 else categories[c - 1]
+    uniques, codes = np.unique(data, return_inverse=True)  # NaN sorts last and stays one group
+    integer = column.get("integer")
+
+    def value(c):
+        v = uniques[c]
+        if np.isnan(v):
+            return None
+        return int(v) if integer and float(v).is_integer() else float(v)
+    return codes, max(len(uniques), 1), value
+
+
+def _group_ids(coded):
+    """Per-row group index and the occupied combined keys, without sorting when the key space is small."""
+    sizes = [size for _, size, _ in coded]
+    combined = np.ravel_multi_index([codes for codes, _, _ in coded], sizes) if len(coded) > 1 else coded[0][0]
+    space = int(np.prod(sizes, dtype=np.float64))
+    if space <= _DENSE_GROUP_LIMIT:
+        occupied = np.flatnonzero(np.bincount(combined, minlength=space))
+        remap = np.zeros(space, dtype=np.int64)
+        remap[occupied] = np.arange(len(occupied))
+        return remap[combined], occupied, sizes
+    occupied, gid = np.unique(combined, return_inverse=True)
+    return gid, occupied, sizes
+
+
+def _aggregate_column(table, agg, mask, gid, groups):
+    op = str(agg.get("operation", "")).upper()
+    name = agg.get("column")
+    if op not in _AGGREGATES:
+        raise Unsupported(f"aggregation {op}")
+    if name in (None, "", "*") and op == "COUNT":
+        return np.bincount(gid, minlength=groups).astype(np.float64), True
+    column = table.column(name)
+    if column is None:
+        raise Unsupported(f"unknown column {name}")
+    if column["kind"] == TEXT:
+        if op != "COUNT":
+            raise Unsupported(f"{op} over text column {name}")
+        present = np.asarray(column["data"])[mask] >= 0
+        return np.bincount(gid, weights=present, minlength=groups), True
+    values = np.asarray(column["data"])[mask]
+    present = ~np.isnan(values)
+    counts = np.bincount(gid, weights=present, minlength=groups)
+    if op == "COUNT":
+        return counts, True
+    if op in ("SUM", "AVG"):
+        sums = np.bincount(gid, weights=np.where(present, values, 0.0), minlength=groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = sums if op == "SUM" else sums / counts
+        result[counts == 0] = np.nan
+        return result, op == "SUM" and column.get("integer")
+    if not len(values):
+        return np.full(groups, np.nan), column.get("integer")
+    order = np.argsort(gid, kind="stable")
+    starts = np.searchsorted(gid[order], np.arange(groups))
+    reduce = np.fmin if op == "MIN" else np.fmax
+    return reduce.reduceat(values[order], starts), column.get("integer")
+
+
+def _cell(value, integer):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    value = float(value)
+    return int(value) if integer and value.is_integer() else value
+
+
+def aggregate(table_name, aggregations, group_by=None, where=None, distinct=False, limit=None, offset=0):
+    """Vectorized GROUP BY / aggregate over the columnar copy.
+
+    Returns a ResultPage shaped like the SQL path (aggregate columns named like
+    'SUM("Total Price")', preceded by the group keys), or None when the table has
+    no columnar copy or the request needs SQL.
+    """
+    if not COLUMNAR_ENABLED or not aggregations:
+        return None
+    table = load(table_name)
+    if table is None:
+        return None
+    from backend.sql_handler import SQL_MAX_ROWS, ResultPage
+
+    start = time.perf_counter()
+    try:
+        mask = _where_mask(table, where)
+        keys = [_parse_group(table, g) for g in (group_by or [])]
+        if keys:
+            coded = [_group_codes(column, bucket, mask) for _, column, bucket in keys]
+            gid, group_ids, sizes = _group_ids(coded)
+            group_keys = np.unravel_index(group_ids, sizes) if len(coded) > 1 else (group_ids,)
+        else:
+            gid = np.zeros(int(mask.sum()), dtype=np.int64)
+            group_ids, group_keys, coded = np.zeros(1, dtype=np.int64), (), []
+        groups = len(group_ids)
+        results = [_aggregate_column(table, agg, mask, gid, groups) for agg in aggregations]
+    except Unsupported as e:
+        logging.info(f"Columnar engine falling back to SQL for '{table_name}': {e}")
+        return None
+
+    # Catalogued column names, not the model's spelling, so headers match the SQL path exactly.
+    labels = [
+        f'{str(agg["operation"]).upper()}({quote_identifier(table.column(agg["column"])["name"])})'
+        if agg.get("column") not in (None, "", "*") else "COUNT(*)"
+        for agg in aggregations
+    ]
+    rows = []
+    for g in range(groups):
+        row = {label: decode(int(group_keys[k][g])) for k, ((label, _, _), (_, _, decode)) in enumerate(zip(keys, coded))}
+        for label, (values, integer) in zip(labels, results):
+            row[label] = _cell(values[g], integer)
+        rows.append(row)
+    if keys:
+        # Same order as SQLite's GROUP BY: ascending by the group keys, NULLs first.
+        labels_by_key = [label for label, _, _ in keys]
+        rows.sort(key=lambda r: tuple((r[k] is not None, r[k] if r[k] is not None else 0) for k in labels_by_key))
+    if distinct:
+        seen, unique_rows = set(), []
+        for row in rows:
+            marker = tuple(row.values())
+            if marker not in seen:
+                seen.add(marker)
+                unique_rows.append(row)
+        rows = unique_rows
+
+    max_rows = min(int(limit), SQL_MAX_ROWS) if limit else SQL_MAX_ROWS
+    offset = max(int(offset or 0), 0)
+    page = rows[offset:offset + max_rows]
+    logging.info(
+        f"Columnar aggregate on '{table_name}': {int(mask.sum())} rows -> {groups} groups "
+        f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+    return ResultPage(page, truncated=len(rows) > offset + max_rows, offset=offset)
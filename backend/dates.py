@@ -0,0 +1,69 @@
+import re
+
+# Derived columns stored next to every detected date column, e.g. "Sale Date__date".
+DATE_SUFFIX = "__date"
+YEAR_SUFFIX = "__year"
+MONTH_SUFFIX = "__month"
+DAY_SUFFIX = "__day"
+DERIVED_SUFFIXES = (DATE_SUFFIX, YEAR_SUFFIX, MONTH_SUFFIX, DAY_SUFFIX)
+
+# (detector, format name, kind); the DD/MM forms are flipped to MM/DD when the sample demands it.
+_DATE_FORMATS = (
+    (re.compile(r"^\d{4}-\d{2}-\d{2}$"), "YYYY-MM-DD", "date"),
+    (re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$"), "YYYY-MM-DD HH:MM:SS", "datetime"),
+    (re.compile(r"^\d{4}/\d{2}/\d{2}$"), "YYYY/MM/DD", "date"),
+    (re.compile(r"^\d{1,2}/\d{1,2}/\d{4}$"), "DD/MM/YYYY", "date"),
+    (re.compile(r"^\d{1,2}-\d{1,2}-\d{4}$"), "DD-MM-YYYY", "date"),
+)
+# Lenient parsers per format: a datetime's time part is ignored, single-digit day/month accepted.
+_PARSERS = {
+    "YYYY-MM-DD": re.compile(r"^\s*(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})"),
+    "YYYY-MM-DD HH:MM:SS": re.compile(r"^\s*(?P<y>\d{4})-(?P<m>\d{1,2})-(?P<d>\d{1,2})"),
+    "YYYY/MM/DD": re.compile(r"^\s*(?P<y>\d{4})/(?P<m>\d{1,2})/(?P<d>\d{1,2})"),
+    "DD/MM/YYYY": re.compile(r"^\s*(?P<d>\d{1,2})/(?P<m>\d{1,2})/(?P<y>\d{4})"),
+    "MM/DD/YYYY": re.compile(r"^\s*(?P<m>\d{1,2})/(?P<d>\d{1,2})/(?P<y>\d{4})"),
+    "DD-MM-YYYY": re.compile(r"^\s*(?P<d>\d{1,2})-(?P<m>\d{1,2})-(?P<y>\d{4})"),
+    "MM-DD-YYYY": re.compile(r"^\s*(?P<m>\d{1,2})-(?P<d>\d{1,2})-(?P<y>\d{4})"),
+}
+
+
+def detect_date_format(values):
+    """(format, "date" | "datetime") shared by at least 90% of the sample strings, else (None, None)."""
+    values = [v.strip() for v in values if isinstance(v, str) and v.strip()]
+    if not values:
+        return None, None
+    for pattern, fmt, kind in _DATE_FORMATS:
+        matching = [v for v in values if pattern.match(v)]
+        if len(matching) >= 0.9 * len(values):
+            if fmt.startswith("DD"):
+                first = [int(re.split(r"[/-]", v)[0]) for v in matching]
+                second = [int(re.split(r"[/-]", v)[1]) for v in matching]
+                if max(first) <= 12 < max(second):
+                    fmt = "MM" + fmt[2] + "DD" + fmt[5:]
+            return fmt, kind
+    return None, None
+
+
+def parse_date(value, fmt):
+    """(iso_date, year, month, day) for a value in the given format, or None if it does not parse."""
+    if value is None:
+        return None
+    match = _PARSERS[fmt].match(str(value))
+    if not match:
+        return None
+    year, month, day = int(match.group("y")), int(match.group("m")), int(match.group("d"))
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    return f"{year:04d}-{month:02d}-{day:02d}", year, month, day
+
+
+def derived_columns(column):
+    return [column + suffix for suffix in DERIVED_SUFFIXES]
+
+
+def is_derived(column):
+    return str(column).endswith(DERIVED_SUFFIXES)
+
+
+def next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
@@ -0,0 +1,140 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_NAME = "data.db"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA mmap_size={int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+    f"PRAGMA cache_size={int(os.getenv('DB_CACHE_KB', '-65536'))}",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ConnectionPool:
+    """Fixed-size pool of tuned SQLite connections for one database file.
+
+    Connections are created lazily, handed out one per caller and returned on
+    exit, so concurrent requests share a bounded set of file descriptors.
+    sqlite3's per-connection statement cache (cached_statements) keeps the
+    compiled form of repeated queries.
+    """
+
+    def __init__(self, db_name=DB_NAME, size=DB_POOL_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_name,
+            check_same_thread=False,
+            cached_statements=DB_STATEMENT_CACHE,
+            timeout=5.0,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self, timeout=30.0):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return _PooledConnection(self._open(), self._generation)
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._idle.get(timeout=timeout)
+
+    def _release(self, pooled):
+        if pooled.generation != self._generation:
+            self._discard(pooled)
+            return
+        if pooled.conn.in_transaction:
+            pooled.conn.rollback()
+        self._idle.put(pooled)
+
+    def _discard(self, pooled):
+        try:
+            pooled.conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success and rolls back on error."""
+        pooled = self._acquire()
+        try:
+            yield pooled.conn
+            if pooled.conn.in_transaction:
+                pooled.conn.commit()
+        except Exception:
+            if pooled.conn.in_transaction:
+                pooled.conn.rollback()
+            raise
+        finally:
+            self._release(pooled)
+
+    def close_all(self):
+        """Close idle connections and retire busy ones when they come back (e.g. before deleting the file)."""
+        with self._lock:
+            self._generation += 1
+        closed = 0
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(pooled)
+            closed += 1
+        logging.info(f"Closed {closed} pooled connections for {self.db_name}")
+
+
+class _PooledConnection:
+    __slots__ = ("conn", "generation")
+
+    def __init__(self, conn, generation):
+        self.conn = conn
+        self.generation = generation
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name=DB_NAME) -> ConnectionPool:
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            pool = _pools[db_name] = ConnectionPool(db_name)
+        return pool
+
+
+def connection(db_name=DB_NAME):
+    """Shortcut for get_pool(db_name).connection()."""
+    return get_pool(db_name).connection()
+
+
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
@@ -1,7 +1,9 @@
 from backend.sql_handler import get_selected_columns
+from backend.sql_compiler import QueryError, parse_where, predicate_columns
 from backend.embedding import search_similar
+from backend import columnar, indexer
+from backend.aggregate_cache import cached_aggregate
 from google.protobuf.json_format import MessageToDict
-import re
 import json
 from proto.marshal.collections.maps import MapComposite
 from google.protobuf.struct_pb2 import Struct
@@ -22,24 +24,8 @@ def clean_args(raw_args):
 
 
 def convert_where_clause(where):
-    if isinstance(where, dict):
-        parts = []
-        for k, v in where.items():
-            v = str(v).strip()
-            if re.match(r"\d{4}-\d{2}-\d{2}", v):
-                parts.append(f'DATE("{k}") = \'{v}\'')
-            elif "%" in v or "_" in v:
-                parts.append(f'"{k}" LIKE \'{v}\' COLLATE NOCASE')
-            else:
-                parts.append(f'"{k}" = \'{v}\' COLLATE NOCASE')
-        return " AND ".join(parts)
-
-    elif isinstance(where, str):
-        s = re.sub(r"=\s*\'([^']*[%_][^']*)\'", r"LIKE \'\1\'", where)
-        return re.sub(r"([\w\s]+)(\s*=\s*|LIKE\s*)", 
-                      lambda m: f'"{m.group(1).strip()}"{m.group(2)} COLLATE NOCASE', s)
-
-    return None
+    """Structured, bound predicates for the model's whereClause (see sql_compiler.parse_where)."""
+    return parse_where(where)
 
 
 def proto_to_dict(proto_obj):
@@ -66,17 +52,50 @@ def flatten_aggregations(aggs):
     return [proto_to_dict(agg) for agg in aggs]
 
 
-FUNCTION_REGISTRY = {
-    "get_order_details": lambda args: get_selected_columns(
+def get_order_details(args, offset=0, limit=None):
+    where = proto_to_dict(args.get("whereClause") or args.get("where_clause"))
+    group_by = [proto_to_dict(g) for g in args.get("group_by", [])]
+    aggregations = flatten_aggregations(args.get("aggregations"))
+    if aggregations:
+        # Reporting queries repeat a lot; serve them from the per-table versioned cache.
+        return cached_aggregate(
+            args["table_name"], aggregations, group_by, where, args.get("distinct", False), offset, limit,
+            lambda: _run_order_query(args, where, group_by, aggregations, offset, limit),
+        )
+    return _run_order_query(args, where, group_by, aggregations, offset, limit)
+
+
+def _run_order_query(args, where, group_by, aggregations, offset, limit):
+    if aggregations:
+        result = columnar.aggregate(
+            args["table_name"], aggregations, group_by=group_by, where=where,
+            distinct=args.get("distinct", False), limit=limit, offset=offset,
+        )
+        if result is not None:
+            return result
+    try:
+        predicates = convert_where_clause(where)
+    except QueryError as e:
+        return str(e)
+    indexer.observe_query(
+        args["table_name"],
+        where_columns=predicate_columns(predicates),
+        group_by=group_by,
+    )
+    return get_selected_columns(
         table_name=args["table_name"],
         columns=args.get("columns", []),
-        where_clause=convert_where_clause(
-            proto_to_dict(args.get("whereClause") or args.get("where_clause"))
-        ),
-        aggregations=flatten_aggregations(args.get("aggregations")),
-        group_by=[proto_to_dict(g) for g in args.get("group_by", [])],
-        distinct=args.get("distinct", False)
-    ),
+        where_clause=predicates,
+        aggregations=aggregations,
+        group_by=group_by,
+        distinct=args.get("distinct", False),
+        limit=limit,
+        offset=offset,
+    )
+
+
+FUNCTION_REGISTRY = {
+    "get_order_details": get_order_details,
 
 
     "get_policy_info": lambda args: search_similar(
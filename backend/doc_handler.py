@@ -1,12 +1,92 @@
-import PyPDF2
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import docx
 
-def extract_pdf_text(filepath):
+from backend.pdf_worker import extract_page_range, fitz, iter_page_range
+
+# Documents with at least this many pages are split across worker processes.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "48"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def _page_count(filepath):
+    if fitz is not None:
+        try:
+            with fitz.open(filepath) as doc:
+                return doc.page_count, "fitz"
+        except Exception as e:
+            logging.warning(f"PyMuPDF could not open {filepath} ({e}); falling back to PyPDF2.")
     from PyPDF2 import PdfReader
-    with open(filepath, "rb") as f:
-        reader = PdfReader(f)
-        return " ".join([page.extract_text() or "" for page in reader.pages])
+    return len(PdfReader(filepath).pages), "pypdf2"
+
+
+def iter_pdf_pages(filepath, on_progress=None, workers=None):
+    """Yield the text of each PDF page in order without materialising the whole document.
+
+    Uses PyMuPDF when available and PyPDF2 otherwise. Large documents are split into
+    page ranges extracted by a process pool, with a bounded number of ranges in flight.
+    """
+    total, backend = _page_count(filepath)
+    workers = workers or PDF_EXTRACT_WORKERS
+    if total < PDF_PARALLEL_MIN_PAGES or workers <= 1:
+        for i, text in enumerate(iter_page_range(filepath, backend, 0, total)):
+            yield text
+            if on_progress:
+                on_progress(i + 1, total)
+        return
+
+    logging.info(f"Extracting {total} pages from {filepath} with {workers} processes ({backend}).")
+    ranges = ((s, min(s + PDF_PAGES_PER_TASK, total)) for s in range(0, total, PDF_PAGES_PER_TASK))
+    # spawn: the upload job runs on a thread, and forking a threaded server is unsafe. Workers
+    # re-import the parent's __main__, so start the server with `python -m backend` (see there).
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque()
+
+        def submit_next():
+            page_range = next(ranges, None)
+            if page_range is not None:
+                pending.append((page_range, pool.submit(extract_page_range, filepath, backend, *page_range)))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while pending:
+            (_, stop), future = pending.popleft()
+            texts = future.result()
+            submit_next()
+            yield from texts
+            if on_progress:
+                on_progress(stop, total)
+
+
+def extract_pdf_pages(filepath):
+    """Text of each PDF page, in order."""
+    return list(iter_pdf_pages(filepath))
+
+
+def extract_pdf_text(filepath):
+    return " ".join(iter_pdf_pages(filepath))
+
 
 def extract_docx_text(filepath):
     doc = docx.Document(filepath)
     return " ".join(para.text for para in doc.paragraphs)
+
+
+def extract_docx_blocks(filepath):
+    """(kind, text) blocks for the chunker, using Word heading styles to mark section titles."""
+    from backend.chunking import HEADING, TEXT
+    doc = docx.Document(filepath)
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        style = (para.style.name or "") if para.style is not None else ""
+        kind = HEADING if style.startswith(("Heading", "Title")) else TEXT
+        yield kind, text
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import time
+
+from backend import db_pool
+
+DOC_REGISTRY_PATH = os.getenv("DOC_REGISTRY_PATH", "doc_registry.db")
+
+
+def file_hash(filepath, block_size=1024 * 1024):
+    """sha256 of a file's bytes, read in blocks."""
+    h = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _connection():
+    return db_pool.connection(DOC_REGISTRY_PATH)
+
+
+def _ensure_schema(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS documents (
+               file_name TEXT PRIMARY KEY,
+               content_hash TEXT NOT NULL,
+               chunk_count INTEGER NOT NULL,
+               embed_model TEXT NOT NULL,
+               collection TEXT NOT NULL,
+               indexed_at REAL NOT NULL
+           )"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS chunks (
+               file_name TEXT NOT NULL,
+               chunk_id TEXT NOT NULL,
+               PRIMARY KEY (file_name, chunk_id)
+           ) WITHOUT ROWID"""
+    )
+
+
+def get(file_name):
+    """Registry row for a document as a dict, or None if it was never indexed."""
+    with _connection() as conn:
+        _ensure_schema(conn)
+        cursor = conn.execute("SELECT * FROM documents WHERE file_name = ?", (file_name,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([d[0] for d in cursor.description], row))
+
+
+def record(file_name, content_hash, chunk_count, embed_model, collection="documents", chunk_ids=None):
+    """Upsert a document's registry row and, if given, replace its set of chunk IDs."""
+    with _connection() as conn:
+        _ensure_schema(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+            (file_name, content_hash, chunk_count, embed_model, collection, time.time()),
+        )
+        if chunk_ids is not None:
+            conn.execute("DELETE FROM chunks WHERE file_name = ?", (file_name,))
+            conn.executemany("INSERT INTO chunks VALUES (?, ?)", ((file_name, c) for c in chunk_ids))
+
+
+def chunk_ids(file_name):
+    """IDs of the chunks currently stored for a document."""
+    with _connection() as conn:
+        _ensure_schema(conn)
+        rows = conn.execute("SELECT chunk_id FROM chunks WHERE file_name = ?", (file_name,))
+        return {r[0] for r in rows}
+
+
+def remove(file_name):
+    with _connection() as conn:
+        _ensure_schema(conn)
+        conn.execute("DELETE FROM documents WHERE file_name = ?", (file_name,))
+        conn.execute("DELETE FROM chunks WHERE file_name = ?", (file_name,))
+
+
+def list_documents():
+    with _connection() as conn:
+        _ensure_schema(conn)
+        cursor = conn.execute("SELECT * FROM documents ORDER BY indexed_at DESC")
+        headers = [d[0] for d in cursor.description]
+        return [dict(zip(headers, row)) for row in cursor.fetchall()]
+
+
+def clear():
+    with _connection() as conn:
+        _ensure_schema(conn)
+        conn.execute("DELETE FROM documents")
+        conn.execute("DELETE FROM chunks")
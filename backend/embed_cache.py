@@ -0,0 +1,132 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embed_cache.db")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+# SQLite caps the number of host parameters per statement; stay well below it.
+_LOOKUP_CHUNK = 500
+
+
+def cache_key(model: str, task_type: str, text: str) -> str:
+    """Content address for an embedding: hash of (model, task_type, text)."""
+    h = hashlib.sha256()
+    for part in (model, task_type, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _pack(vector) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes):
+    vec = array("f")
+    vec.frombytes(blob)
+    return vec.tolist()
+
+
+class EmbeddingCache:
+    """Persistent float32 embedding store keyed by content hash, with LRU eviction."""
+
+    def __init__(self, path=EMBED_CACHE_PATH, max_entries=EMBED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = 0
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                       key TEXT PRIMARY KEY,
+                       dim INTEGER NOT NULL,
+                       vector BLOB NOT NULL,
+                       last_used REAL NOT NULL
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            self._size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, task_type: str, texts):
+        """Return {index: vector} for every text already cached."""
+        keys = [cache_key(model, task_type, t) for t in texts]
+        found = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                for i in range(0, len(keys), _LOOKUP_CHUNK):
+                    part = keys[i:i + _LOOKUP_CHUNK]
+                    marks = ",".join("?" * len(part))
+                    rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part)
+                    found.update((k, _unpack(v)) for k, v in rows)
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, k) for k in found],
+                    )
+                    conn.commit()
+        except sqlite3.Error:
+            logging.exception("Embedding cache lookup failed")
+            found = {}
+
+        result = {i: found[k] for i, k in enumerate(keys) if k in found}
+        self.hits += len(result)
+        self.misses += len(keys) - len(result)
+        return result
+
+    def put_many(self, model: str, task_type: str, texts, vectors):
+        """Store vectors for the given texts, evicting least-recently-used entries past the cap."""
+        now = time.time()
+        rows = [
+            (cache_key(model, task_type, t), len(v), _pack(v), now)
+            for t, v in zip(texts, vectors)
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+                self._size += len(rows)
+                if self._size > self.max_entries:
+                    self._size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                    overflow = self._size - self.max_entries
+                    if overflow > 0:
+                        conn.execute(
+                            "DELETE FROM embeddings WHERE key IN "
+                            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                            (overflow,),
+                        )
+                        self._size -= overflow
+                        logging.info(f"Embedding cache evicted {overflow} entries")
+                conn.commit()
+        except sqlite3.Error:
+            logging.exception("Embedding cache write failed")
+
+    def stats(self):
+        return {"entries": self._size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+cache = EmbeddingCache()
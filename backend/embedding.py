@@ -2,19 +2,40 @@
 
 from dotenv import load_dotenv
 load_dotenv()
+import hashlib
 import logging
 import os
+import random
+import time
 import uuid
-import fitz
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct, Distance, VectorParams
+from qdrant_client.models import Distance, VectorParams, PayloadSchemaType
 from google.generativeai import embed_content
-from google.generativeai import GenerativeModel
+from backend.embed_cache import cache as embedding_cache
+from backend.vector_store import get_store
+from backend import doc_registry, keyword_index
+from backend.chunking import chunk_pages
+from backend.doc_handler import iter_pdf_pages
+from backend.prompts import QA_INSTRUCTIONS, PromptModel, qa_prompt
 
-qa_model = GenerativeModel("gemini-2.5-flash")
+qa_model = PromptModel("qa", QA_INSTRUCTIONS)
 
 EMBED_MODEL = "models/gemini-embedding-001"
 
+# Batching / concurrency knobs for the ingest pipeline.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "128"))
+
+# Retrieval: "hybrid" fuses BM25 and vector hits, "keyword" needs no query embedding, "vector" is dense only.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
 client = QdrantClient(
     url=os.getenv("QDRANT_URL"),
     api_key=os.getenv("QDRANT_API_KEY"),
@@ -23,13 +44,9 @@ client = QdrantClient(
 
 
 
-def extract_text_chunks(file_path, chunk_size=500):
-    """Extract text from PDF and split into chunks."""
-    doc = fitz.open(file_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+def extract_text_chunks(file_path):
+    """Extract text from PDF and split it with the shared structure-aware chunker."""
+    return chunk_pages(iter_pdf_pages(file_path))
 
 
 def ensure_collection_exists(vector_size: int, collection_name="documents"):
@@ -58,36 +75,236 @@ def ensure_collection_exists(vector_size: int, collection_name="documents"):
                 )
             else:
                 logging.info(f"Collection '{collection_name}' already exists with correct dim={existing_dim}.")
+        ensure_payload_index(collection_name)
     except Exception as e:
         logging.exception("Error ensuring collection")
 
 
-def index_document(text_chunks, file_name: str, collection_name="documents"):
-    """Index document chunks into Qdrant with embeddings."""
-    embeddings = [
-        embed_content(content=chunk, model=EMBED_MODEL, task_type="retrieval_document")['embedding']
-        for chunk in text_chunks
-    ]
+def ensure_payload_index(collection_name="documents", field_name="file_name"):
+    """Keyword index on file_name so per-file filters, counts and deletes avoid a collection scan."""
+    try:
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=PayloadSchemaType.KEYWORD,
+        )
+    except Exception:
+        logging.exception(f"Could not create payload index on '{field_name}'")
 
-    ensure_collection_exists(vector_size=len(embeddings[0]), collection_name=collection_name)
 
-    points = [
-        PointStruct(
-            id=str(uuid.uuid4()),
-            vector=emb,
-            payload={"text": chunk, "file_name": file_name}
-        )
-        for chunk, emb in zip(text_chunks, embeddings)
-    ]
+def _is_rate_limited(err) -> bool:
+    """Best-effort detection of a provider rate-limit / quota error."""
+    code = getattr(err, "code", None)
+    if code == 429 or getattr(code, "value", None) == 429:
+        return True
+    text = f"{type(err).__name__} {err}".lower()
+    return any(tag in text for tag in ("429", "resourceexhausted", "resource exhausted", "quota", "rate limit"))
+
+
+def embed_batch(texts, task_type="retrieval_document", embed_fn=None, max_retries=None, use_cache=True):
+    """Embed a list of texts, serving repeats from the on-disk cache and sending the rest in one request.
+
+    The cache is keyed by EMBED_MODEL, so a custom embed_fn (tests, benchmarks) bypasses it.
+    """
+    texts = list(texts)
+    if not use_cache or embed_fn is not None:
+        return _embed_uncached(texts, task_type, embed_fn, max_retries)
+
+    vectors = embedding_cache.get_many(EMBED_MODEL, task_type, texts)
+    missing = [i for i in range(len(texts)) if i not in vectors]
+    if missing:
+        fresh = _embed_uncached([texts[i] for i in missing], task_type, embed_fn, max_retries)
+        embedding_cache.put_many(EMBED_MODEL, task_type, [texts[i] for i in missing], fresh)
+        vectors.update(zip(missing, fresh))
+    return [vectors[i] for i in range(len(texts))]
+
+
+def _embed_uncached(texts, task_type, embed_fn=None, max_retries=None):
+    """Embed a list of texts in a single request, retrying with backoff on rate limits."""
+    embed_fn = embed_fn or embed_content
+    max_retries = EMBED_MAX_RETRIES if max_retries is None else max_retries
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        try:
+            result = embed_fn(content=texts, model=EMBED_MODEL, task_type=task_type)
+            vectors = result["embedding"]
+            if len(texts) == 1 and vectors and not isinstance(vectors[0], (list, tuple)):
+                vectors = [vectors]
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedder returned {len(vectors)} vectors for {len(texts)} texts")
+            return vectors
+        except Exception as e:
+            if attempt >= max_retries or not _is_rate_limited(e):
+                raise
+            sleep_for = delay + random.uniform(0, delay / 2)
+            logging.warning(f"Embedding rate limited (attempt {attempt + 1}/{max_retries}), retrying in {sleep_for:.1f}s")
+            time.sleep(sleep_for)
+            delay = min(delay * 2, 30.0)
+
+
+def iter_embedded_batches(text_chunks, task_type="retrieval_document", batch_size=None,
+                          max_workers=None, embed_fn=None):
+    """Yield (chunks, vectors) per batch, in order, keeping up to max_workers batches in flight."""
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    max_workers = max_workers or EMBED_MAX_WORKERS
+    batches = (text_chunks[i:i + batch_size] for i in range(0, len(text_chunks), batch_size))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed") as pool:
+        pending = deque()
+
+        def submit_next():
+            batch = next(batches, None)
+            if batch is not None:
+                pending.append((batch, pool.submit(embed_batch, batch, task_type, embed_fn)))
+
+        for _ in range(max_workers):
+            submit_next()
+
+        while pending:
+            batch, future = pending.popleft()
+            vectors = future.result()
+            submit_next()
+            yield batch, vectors
+
+
+CHUNK_ID_NAMESPACE = uuid.UUID("7f1c5a2e-3b9d-4e61-9a0f-2d8c4b6e1a37")
+
+
+def chunk_ids_for(file_name, text_chunks):
+    """Stable UUIDs from (file name, chunk hash, occurrence) so unchanged chunks keep their IDs."""
+    seen = {}
+    ids = []
+    for chunk in text_chunks:
+        digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        ids.append(str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{file_name}\x00{digest}\x00{occurrence}")))
+    return ids
+
+
+def index_document(text_chunks, file_name: str, collection_name="documents", embed_fn=None, on_progress=None,
+                   content_hash=None):
+    """Index document chunks into the vector store, embedding in concurrent batches and streaming upserts.
+
+    Re-indexing is incremental: only chunks whose content-derived ID is new are
+    embedded and upserted, and chunks no longer present for file_name are deleted.
+    on_progress, if given, is called as on_progress(chunks_done, chunks_total) after each upsert.
+    """
+    text_chunks = [chunk for chunk in text_chunks if chunk and chunk.strip()]
+    if not text_chunks:
+        logging.warning(f"No text chunks to index for '{file_name}'.")
+        return 0
+
+    start = time.time()
+    store = get_store(collection_name)
+    if content_hash is None:
+        content_hash = hashlib.sha256("\x00".join(text_chunks).encode("utf-8")).hexdigest()
+
+    ids = chunk_ids_for(file_name, text_chunks)
+    entry = verified_entry(file_name, collection_name)
+    existing = doc_registry.chunk_ids(file_name) if entry is not None else set()
+    if entry is not None and (not existing or entry["embed_model"] != EMBED_MODEL):
+        # Indexed before chunk IDs were tracked, or with another model: start over.
+        logging.info(f"Replacing all existing vectors for '{file_name}'")
+        store.delete_file(file_name)
+        keyword_index.delete_file(file_name)
+        existing = set()
 
-    client.upsert(collection_name=collection_name, points=points)
+    wanted = set(ids)
+    stale = existing - wanted
+    pending = [(i, c) for i, c in zip(ids, text_chunks) if i not in existing]
+    logging.info(
+        f"'{file_name}': {len(ids)} chunks, {len(pending)} new/changed, "
+        f"{len(stale)} removed, {len(wanted) - len(pending)} unchanged"
+    )
+
+    buffer = []
+    indexed = 0
+    collection_ready = False
+
+    def flush(points):
+        point_ids, vectors, payloads = zip(*points)
+        store.upsert(list(point_ids), list(vectors), list(payloads))
+        if on_progress:
+            on_progress(indexed + len(points), len(pending))
+        return len(points)
+
+    pending_chunks = [c for _, c in pending]
+    pending_ids = iter([i for i, _ in pending])
+    for chunks, embeddings in iter_embedded_batches(pending_chunks, embed_fn=embed_fn):
+        if not collection_ready:
+            store.ensure(len(embeddings[0]))
+            collection_ready = True
+
+        for chunk, emb in zip(chunks, embeddings):
+            digest = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+            buffer.append((next(pending_ids), emb, {"text": chunk, "file_name": file_name, "chunk_hash": digest}))
+        while len(buffer) >= UPSERT_BATCH_SIZE:
+            indexed += flush(buffer[:UPSERT_BATCH_SIZE])
+            buffer = buffer[UPSERT_BATCH_SIZE:]
+
+    if buffer:
+        indexed += flush(buffer)
+    if stale:
+        store.delete_ids(sorted(stale))
+    _sync_keyword_index(file_name, ids, text_chunks)
+    if on_progress and not pending:
+        on_progress(1, 1)
+
+    doc_registry.record(file_name, content_hash, len(wanted), EMBED_MODEL, collection_name, chunk_ids=sorted(wanted))
+
+    logging.info(f"Indexed {indexed} chunks for '{file_name}' in {time.time() - start:.2f}s")
     print(f"✅ File '{file_name}' indexed successfully!")
+    return indexed
+
+
+def _sync_keyword_index(file_name, ids, text_chunks):
+    """Bring the BM25 index in line with the document's current chunks (also backfills older documents)."""
+    indexed = keyword_index.chunk_ids(file_name)
+    keyword_index.delete_ids(sorted(indexed - set(ids)))
+    new = [(i, c) for i, c in zip(ids, text_chunks) if i not in indexed]
+    if new:
+        keyword_index.add(file_name, [i for i, _ in new], [c for _, c in new])
+
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K, limit=RETRIEVAL_TOP_K):
+    """Merge ranked hit lists by summing 1 / (k + rank); hits are matched on id."""
+    scores, hits = {}, {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, start=1):
+            key = str(hit.id)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(key, hit)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [hits[key] for key in ordered]
+
+
+def retrieve(query, collection_name="documents", mode=None, limit=RETRIEVAL_TOP_K):
+    """Top chunks for a query using the configured retrieval mode."""
+    mode = (mode or RETRIEVAL_MODE).lower()
+    keyword_hits = []
+    if mode in ("hybrid", "keyword"):
+        keyword_hits = keyword_index.search(query, limit=RETRIEVAL_CANDIDATES)
+        if mode == "keyword":
+            return keyword_hits[:limit]
+
+    try:
+        embedding = embed_batch([query], task_type="retrieval_query")[0]
+        vector_hits = get_store(collection_name).search(embedding, limit=RETRIEVAL_CANDIDATES)
+    except Exception:
+        if not keyword_hits:
+            raise
+        logging.exception("Vector search failed; answering from keyword hits only")
+        return keyword_hits[:limit]
+
+    if mode == "vector":
+        return vector_hits[:limit]
+    return reciprocal_rank_fusion(keyword_hits, vector_hits, limit=limit)
 
 
 def search_similar(query, collection_name="documents"):
     """Search similar text chunks and generate answer."""
-    embedding = embed_content(content=query, model=EMBED_MODEL, task_type="retrieval_query")['embedding']
-    hits = client.search(collection_name, query_vector=embedding, limit=5)
+    hits = retrieve(query, collection_name)
 
     if not hits:
        return "Please upload a file first"
@@ -95,33 +312,49 @@ def search_similar(query, collection_name="documents"):
 
     context = "\n\n".join(hit.payload["text"] for hit in hits if "text" in hit.payload)
 
-    prompt = f"""
-You are an intelligent assistant. Based on the following document content, answer the question concisely and clearly.
-
-Document Content:
-\"\"\"
-{context}
-\"\"\"
-
-Question: {query}
-Answer:
-"""
+    prompt = qa_prompt(query, context)
     response = qa_model.generate_content(prompt)
     return response.text.strip()
 
 
+def verified_entry(file_name, collection_name="documents"):
+    """Registry entry for a document, or None if the store no longer holds its vectors.
+
+    The registry can outlive the points (collection recreated, re-index failed after deletes),
+    so the first and last recorded chunk IDs are looked up; if either is missing, the stale
+    entry and any leftover points are dropped so the next upload re-indexes from scratch.
+    """
+    entry = doc_registry.get(file_name)
+    if entry is None:
+        return None
+    ids = sorted(doc_registry.chunk_ids(file_name))
+    store = get_store(collection_name)
+    if not ids or store.has_ids({ids[0], ids[-1]}):
+        return entry
+    logging.warning(f"Registry lists '{file_name}' but its vectors are missing; re-indexing it.")
+    doc_registry.remove(file_name)
+    try:
+        store.delete_file(file_name)
+    except Exception:
+        logging.exception(f"Could not clear leftover vectors for '{file_name}'")
+    return None
+
+
 def check_embeddings_exist(file_name: str, collection_name="documents") -> bool:
-    """Check if a file's embeddings already exist in Qdrant."""
+    """Check if a file's embeddings already exist, using the document registry."""
     try:
-        scroll_result = client.scroll(
-            collection_name=collection_name,
-            limit=1,
-            with_payload=True
-        )
-        for point in scroll_result[0]:
-            if point.payload.get("file_name") == file_name:
-                return True
-        return False
+        entry = verified_entry(file_name, collection_name)
+        if entry is not None:
+            return entry["embed_model"] == EMBED_MODEL and entry["chunk_count"] > 0
+        # Documents indexed before the registry existed: one filtered lookup on the payload index.
+        return get_store(collection_name).has_file(file_name)
     except Exception as e:
         print("Error in checking embeddings:", e)
         return False
+
+
+def delete_document(file_name: str, collection_name="documents"):
+    """Remove a document's vectors and its registry entry."""
+    get_store(collection_name).delete_file(file_name)
+    keyword_index.delete_file(file_name)
+    doc_registry.remove(file_name)
@@ -0,0 +1,214 @@
+import logging
+import os
+import re
+import threading
+
+from backend import catalog
+
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "1") == "1"
+FAST_ROUTER_MIN_CONFIDENCE = float(os.getenv("FAST_ROUTER_MIN_CONFIDENCE", "0.6"))
+
+POLICY_KEYWORDS = {
+    "policy", "policies", "refund", "refunds", "return", "returns", "warranty", "guarantee",
+    "terms", "faq", "guideline", "guidelines", "exchange", "cancellation", "privacy",
+}
+# Words that mean the question needs maths/grouping, which the local router does not attempt.
+AGGREGATION_CUES = {
+    "total", "sum", "average", "avg", "mean", "count", "many", "number", "max", "maximum",
+    "min", "minimum", "highest", "lowest", "most", "least", "top", "per", "by", "group",
+    "each", "all", "list", "between", "compare",
+}
+# Words that point at tabular data rather than documents.
+DATA_CUES = {"order", "orders", "sale", "sales", "customer", "customers", "transaction", "transactions", "product"}
+# Nouns that introduce a bare numeric identifier, e.g. "order 1001".
+ID_HINTS = ("order", "transaction", "product", "customer", "tracking", "id", "#")
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_\-]*")
+_DATE_RE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+_DIGITS_RE = re.compile(r"\d+")
+
+stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _stem(word: str) -> str:
+    word = word.lower()
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def _words(text: str):
+    return [_stem(w) for w in re.split(r"[\s_]+", text) if w]
+
+
+def _shape(value) -> str:
+    """Case-insensitive value shape with digit runs collapsed, e.g. ORD100 and ord7 -> ORD9."""
+    return _DIGITS_RE.sub("9", str(value).strip().upper())
+
+
+def _build_schema(metadata):
+    """Pre-compute word sets for each table and column in table_metadata."""
+    schema = []
+    for table in metadata.get("tables", []):
+        columns = []
+        for col in table.get("Columns", []):
+            words = set(_words(col["Name"]))
+            columns.append({
+                "name": col["Name"],
+                "words": words,
+                "is_id": "id" in words,
+                "shapes": {_shape(v) for v in col.get("Samples", ()) if v is not None},
+            })
+        schema.append({
+            "name": table["Name"],
+            "words": set(_words(table["Name"])),
+            "columns": columns,
+        })
+    return schema
+
+
+_schema_cache = {"version": None, "schema": [], "id_prefixes": set()}
+
+
+def _current_schema():
+    """Word sets for the catalogued tables, rebuilt whenever the catalog changes."""
+    if _schema_cache["version"] != catalog.version:
+        version = catalog.version
+        schema = _build_schema(catalog.table_metadata())
+        _schema_cache.update(
+            version=version,
+            schema=schema,
+            id_prefixes={w for t in schema for c in t["columns"] if c["is_id"] for w in c["words"] - {"id"}},
+        )
+    return _schema_cache["schema"], _schema_cache["id_prefixes"]
+
+
+def _identifier_tokens(tokens):
+    """Return (index, token) pairs that look like record identifiers, e.g. ORD100 or TXN-2001."""
+    found = []
+    for i, tok in enumerate(tokens):
+        if _DATE_RE.match(tok):
+            continue
+        has_digit = any(ch.isdigit() for ch in tok)
+        has_alpha = any(ch.isalpha() for ch in tok)
+        if has_digit and has_alpha:
+            found.append((i, tok))
+        elif has_digit and len(tok) >= 3 and i > 0 and tokens[i - 1].lower() in ID_HINTS:
+            found.append((i, tok))
+    return found
+
+
+def _existing_tables():
+    try:
+        from backend.sql_handler import list_tables
+        if not os.path.exists("data.db"):
+            return set()
+        return {t.lower() for t in list_tables()}
+    except Exception:
+        logging.exception("Fast router could not list tables")
+        return set()
+
+
+def _route_policy(query, tokens, words):
+    if not (words & POLICY_KEYWORDS):
+        return None, 0.0
+    # "how many returns", "total refunds in 2024": counting over data, not a policy lookup;
+    # "warranty on P100" mixes a policy topic with a record, which only the LLM can weigh.
+    if words & DATA_CUES or words & AGGREGATION_CUES or _identifier_tokens(tokens):
+        return None, 0.4
+    return {"function_call": {"name": "get_policy_info", "arguments": {"query": query}}}, 1.0
+
+
+def _route_lookup(query, tokens, words, existing):
+    ids = _identifier_tokens(tokens)
+    if len(ids) != 1:
+        return None, 0.0
+    if words & POLICY_KEYWORDS:
+        return None, 0.3
+    id_index, id_value = ids[0]
+    schema, id_prefixes = _current_schema()
+    hint = _stem(tokens[id_index - 1]) if id_index > 0 else None
+    if hint not in id_prefixes and hint != "id":
+        # "product P100" with no product ID column: guessing another table's ID would mislead.
+        if hint in ID_HINTS:
+            return None, 0.3
+        hint = None
+
+    scored = []
+    for table in schema:
+        if existing and table["name"].lower() not in existing:
+            continue
+        id_cols = [c for c in table["columns"] if c["is_id"]]
+        if hint:
+            id_cols = [c for c in id_cols if hint in c["words"]] or (id_cols if hint == "id" else [])
+        elif len(id_cols) > 1:
+            id_cols = [c for c in id_cols if (c["words"] - {"id"}) & words]
+        if len(id_cols) != 1:
+            continue
+        score = len(table["words"] & words) * 2
+        score += sum(len((c["words"] - {"id"}) & words) for c in table["columns"])
+        scored.append((score, table, id_cols[0]))
+
+    if not scored:
+        return None, 0.0
+    scored.sort(key=lambda s: s[0], reverse=True)
+    best_score, table, id_col = scored[0]
+    runner_up = scored[1][0] if len(scored) > 1 else 0
+    confidence = best_score / (best_score + runner_up) if best_score else 0.0
+    # "price of iPhone15" names a product, not an order: without an ID word in the question,
+    # the token must look like the column's catalogued IDs (same prefix and digit layout).
+    if not (hint or "id" in words or "#" in query or _shape(id_value) in id_col["shapes"]):
+        return None, 0.3
+
+    full = [c["name"] for c in table["columns"] if c is not id_col and c["words"] <= words]
+    generic = {"id", hint} | table["words"]
+    partial = [
+        c["name"] for c in table["columns"]
+        if c is not id_col and (c["words"] - generic) & words
+    ]
+    columns = full or partial
+
+    matched = set().union(table["words"], *(c["words"] for c in table["columns"] if c["name"] in columns))
+    if (words - matched) & AGGREGATION_CUES:
+        return None, 0.0
+
+    call = {
+        "function_call": {
+            "name": "get_order_details",
+            "arguments": {
+                "table_name": table["name"],
+                "columns": columns,
+                "whereClause": {id_col["name"]: id_value},
+            },
+        }
+    }
+    return call, confidence
+
+
+def fast_route(query: str, existing_tables=None):
+    """Resolve obvious queries locally; return a tool call like decide_tool_call or None to fall back."""
+    if not FAST_ROUTER_ENABLED:
+        return None
+    tokens = _TOKEN_RE.findall(query)
+    words = {_stem(t) for t in tokens} | {t.lower() for t in tokens}
+
+    existing = _existing_tables() if existing_tables is None else {t.lower() for t in existing_tables}
+    call, confidence = _route_lookup(query, tokens, words, existing) if existing else (None, 0.0)
+    if call is None:
+        call, confidence = _route_policy(query, tokens, words)
+
+    with _stats_lock:
+        if call is not None and confidence >= FAST_ROUTER_MIN_CONFIDENCE:
+            stats["hits"] += 1
+        else:
+            stats["misses"] += 1
+            call = None
+        rate = stats["hits"] / (stats["hits"] + stats["misses"])
+
+    if call is not None:
+        logging.info(f"Fast router hit ({confidence:.2f}, hit rate {rate:.1%}): {call}")
+    return call
+
+
+def hit_rate() -> float:
+    total = stats["hits"] + stats["misses"]
+    return stats["hits"] / total if total else 0.0
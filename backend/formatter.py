@@ -0,0 +1,25 @@
+from backend.prompts import format_prompt
+from backend.router import model
+
+
+def build_format_prompt(query, raw_result):
+    """Per-call part of the formatting prompt; the guidelines and examples are the model's system instruction."""
+    return format_prompt(query, raw_result)
+
+
+def format_result(query, raw_result):
+    """Send the raw result through the formatting model and return the answer text."""
+    llm_response = model.generate_content(build_format_prompt(query, raw_result))
+    return llm_response.candidates[0].content.parts[0].text
+
+
+def stream_format_result(query, raw_result):
+    """Yield the formatted answer text in chunks as the model generates it."""
+    for chunk in model.generate_content(build_format_prompt(query, raw_result), stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety or finish metadata) raise on .text.
+            continue
+        if text:
+            yield text
@@ -0,0 +1,170 @@
+import logging
+import os
+import re
+import threading
+from collections import Counter
+
+from backend import catalog, db_pool
+from backend.dates import DATE_SUFFIX, DAY_SUFFIX, MONTH_SUFFIX, is_derived
+from backend.sql_compiler import quote_identifier, unquote_identifier
+
+ADAPTIVE_INDEX_THRESHOLD = int(os.getenv("ADAPTIVE_INDEX_THRESHOLD", "3"))
+LOW_CARDINALITY_RATIO = float(os.getenv("LOW_CARDINALITY_RATIO", "0.05"))
+LOW_CARDINALITY_MAX = int(os.getenv("LOW_CARDINALITY_MAX", "1000"))
+CARDINALITY_SAMPLE_ROWS = 20000
+
+_usage = Counter()
+_indexed = set()  # usage keys already indexed (or not indexable) since the table was last loaded
+_usage_lock = threading.Lock()
+
+
+def _metadata_columns(table_name):
+    """Columns described for this table in the catalog, matched case-insensitively."""
+    for table in catalog.table_metadata().get("tables", []):
+        if table["Name"].lower() == table_name.lower():
+            return {c["Name"]: c for c in table.get("Columns", [])}
+    return {}
+
+
+def _is_id_like(column, meta=None):
+    if meta and meta.get("Type") == "string" and re.search(r"\bID\b", meta["Name"]):
+        return True
+    return bool(re.search(r"(^|[\s_])id$", column, re.IGNORECASE))
+
+
+def index_name(table_name, column, collation="nocase"):
+    slug = re.sub(r"\W+", "_", f"{table_name}_{column}").strip("_").lower()
+    return f"ix_{slug}_{collation}"
+
+
+def table_columns(conn, table_name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")]
+
+
+def create_index(conn, table_name, column, nocase=True):
+    """Create an index on one column if it does not exist yet; returns the index name."""
+    name = index_name(table_name, column, "nocase" if nocase else "binary")
+    collate = " COLLATE NOCASE" if nocase else ""
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} "
+        f"ON {quote_identifier(table_name)}({quote_identifier(column)}{collate})"
+    )
+    return name
+
+
+def _low_cardinality_columns(conn, table_name, columns):
+    if not columns:
+        return []
+    distinct = ", ".join(f"COUNT(DISTINCT {quote_identifier(c)})" for c in columns)
+    sample = f"SELECT * FROM {quote_identifier(table_name)} LIMIT {CARDINALITY_SAMPLE_ROWS}"
+    row = conn.execute(f"SELECT COUNT(*), {distinct} FROM ({sample})").fetchone()
+    total, counts = row[0], row[1:]
+    if not total:
+        return []
+    return [
+        c for c, n in zip(columns, counts)
+        if n <= LOW_CARDINALITY_MAX and n / total <= LOW_CARDINALITY_RATIO
+    ]
+
+
+def create_date_indexes(conn, table_name, column):
+    """Index the derived columns of one date column: ISO date for equality/ranges, (month, day) for
+    "every July 4th" style filters. Returns the index names."""
+    created = []
+    for key, parts in (("date", [DATE_SUFFIX]), ("month_day", [MONTH_SUFFIX, DAY_SUFFIX])):
+        name = index_name(table_name, column, key)
+        indexed = ", ".join(quote_identifier(column + suffix) for suffix in parts)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} ON {quote_identifier(table_name)}({indexed})")
+        created.append(name)
+    return created
+
+
+def build_load_time_indexes(conn, table_name):
+    """Index ID-like and low-cardinality text columns, and derived date columns, right after a table is (re)loaded."""
+    all_columns = table_columns(conn, table_name)
+    columns = [c for c in all_columns if not is_derived(c)]
+    meta = _metadata_columns(table_name)
+    types = {row[1]: (row[2] or "").upper() for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")}
+
+    targets = [c for c in columns if _is_id_like(c, meta.get(c))]
+    text_columns = [c for c in columns if c not in targets and types.get(c) in ("TEXT", "")]
+    targets += _low_cardinality_columns(conn, table_name, text_columns)
+
+    created = [create_index(conn, table_name, c) for c in targets]
+    dated = [c for c in columns if c + DATE_SUFFIX in all_columns]
+    for c in dated:
+        created += create_date_indexes(conn, table_name, c)
+    if created:
+        conn.execute("ANALYZE")
+        logging.info(f"Created load-time indexes on '{table_name}': {targets}, date columns {dated}")
+    return created
+
+
+def _usage_indexes(conn, table_name, column, declared, nocase, columns):
+    """Indexes that match how sql_compiler queries a column: filters on a date column run on its
+    derived columns, numbers compare without NOCASE, and text equality uses NOCASE."""
+    if nocase and (column + DATE_SUFFIX).lower() in columns:
+        return create_date_indexes(conn, table_name, column)
+    if declared in ("INTEGER", "REAL"):
+        nocase = False
+    return [create_index(conn, table_name, column, nocase=nocase)]
+
+
+def observe_query(table_name, where_columns=(), group_by=()):
+    """Record predicate/grouping columns and add an index once a column is used often enough.
+
+    where_columns are the columns of the parsed predicates (dict and string where-clauses alike,
+    see sql_compiler.predicate_columns), so every compiled filter counts towards an index.
+    """
+    if not table_name:
+        return []
+    to_create = []
+    with _usage_lock:
+        for column, nocase in [(c, True) for c in where_columns] + [(c, False) for c in group_by]:
+            # The model's spelling varies ("country" / "Country"); the compiler resolves it case-insensitively.
+            key = (table_name.lower(), unquote_identifier(column).lower(), nocase)
+            _usage[key] += 1
+            if _usage[key] >= ADAPTIVE_INDEX_THRESHOLD and key not in _indexed:
+                to_create.append(key)
+    if not to_create or not os.path.exists(db_pool.DB_NAME):
+        return []
+
+    created = []
+    try:
+        with db_pool.connection() as conn:
+            existing = {
+                row[1].lower(): (row[1], (row[2] or "").upper())
+                for row in conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})")
+            }
+            for key in to_create:
+                _, column, nocase = key
+                if column in existing:
+                    actual, declared = existing[column]
+                    created += [
+                        name for name in _usage_indexes(conn, table_name, actual, declared, nocase, existing)
+                        if name not in created
+                    ]
+                with _usage_lock:
+                    # Expressions such as strftime(...) never resolve; stop retrying them too.
+                    _indexed.add(key)
+    except Exception:
+        logging.exception(f"Adaptive indexing failed for '{table_name}'")
+        return []
+    if created:
+        logging.info(f"Adaptive indexes created on '{table_name}': {created}")
+    return created
+
+
+def reset_table(table_name):
+    """Forget usage for a table that was just (re)loaded; its old indexes were dropped with it."""
+    table = table_name.lower()
+    with _usage_lock:
+        for key in [k for k in _usage if k[0] == table]:
+            del _usage[key]
+        _indexed.difference_update({k for k in _indexed if k[0] == table})
+
+
+def reset_usage():
+    with _usage_lock:
+        _usage.clear()
+        _indexed.clear()
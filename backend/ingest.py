@@ -0,0 +1,238 @@
+import codecs
+import datetime
+import logging
+import os
+import re
+import threading
+import time
+from itertools import chain, islice
+
+import pandas as pd
+
+from backend import catalog, columnar, dates, db_pool, indexer
+from backend.aggregate_cache import aggregate_cache
+from backend.sql_compiler import quote_identifier
+
+CSV_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+INSERT_BATCH_ROWS = int(os.getenv("INGEST_INSERT_BATCH", "5000"))
+SCHEMA_SAMPLE_ROWS = int(os.getenv("INGEST_SCHEMA_SAMPLE_ROWS", "10000"))
+ENCODING_SAMPLE_BYTES = 1024 * 1024
+
+# A load holds one write transaction for its whole duration, longer than SQLite's busy_timeout,
+# so concurrent uploads take turns instead of failing with "database is locked".
+_load_lock = threading.Lock()
+
+
+def table_name_for(name: str) -> str:
+    """Same normalisation the upload endpoint has always used for table names."""
+    return re.sub(r'\W+', '_', name).strip('_').lower()
+
+
+def sniff_encoding(filepath, sample_bytes=ENCODING_SAMPLE_BYTES) -> str:
+    """Pick an encoding from a leading sample instead of re-reading the whole file on failure."""
+    with open(filepath, "rb") as f:
+        sample = f.read(sample_bytes)
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False tolerates a multi-byte character cut off at the end of the sample.
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        logging.info("UTF-8 sniff failed, using ISO-8859-1")
+        return "ISO-8859-1"
+
+
+def _sql_type(values) -> str:
+    seen = set()
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool) or isinstance(v, int):
+            seen.add("INTEGER")
+        elif isinstance(v, float):
+            seen.add("REAL")
+        else:
+            return "TEXT"
+    if not seen:
+        return "TEXT"
+    return "REAL" if "REAL" in seen else "INTEGER"
+
+
+def infer_schema(columns, sample_rows):
+    """Map each column to INTEGER / REAL / TEXT from a sample of already-parsed rows."""
+    return [_sql_type(row[i] for row in sample_rows) for i in range(len(columns))]
+
+
+def _normalize_value(v):
+    if isinstance(v, float) and v != v:
+        return None
+    if isinstance(v, datetime.datetime):
+        return str(v)
+    if isinstance(v, (datetime.date, datetime.time)):
+        return v.isoformat()
+    return v
+
+
+def _dedupe(columns):
+    seen = {}
+    result = []
+    for i, col in enumerate(columns):
+        col = str(col).strip() if col is not None and str(col).strip() else f"Unnamed: {i}"
+        if col in seen:
+            seen[col] += 1
+            col = f"{col}.{seen[col]}"
+        else:
+            seen[col] = 0
+        result.append(col)
+    return result
+
+
+def detect_date_columns(columns, types, sample_rows):
+    """[(index, format)] for TEXT columns whose sample values are dates (see dates.detect_date_format)."""
+    taken = {c.lower() for c in columns}
+    found = []
+    for i, (column, sql_type) in enumerate(zip(columns, types)):
+        if sql_type != "TEXT" or any(d.lower() in taken for d in dates.derived_columns(column)):
+            continue
+        fmt, _ = dates.detect_date_format([row[i] for row in sample_rows])
+        if fmt:
+            found.append((i, fmt))
+    return found
+
+
+_NO_DATE = (None, None, None, None)
+
+
+def _with_date_parts(row, date_columns):
+    """Append (ISO date, year, month, day) for each date column so date filters can use plain indexes."""
+    parts = []
+    for i, fmt in date_columns:
+        parts.extend(dates.parse_date(row[i], fmt) or _NO_DATE)
+    return row + tuple(parts)
+
+
+def ingest_rows(conn, table_name, columns, rows, source=None):
+    """Replace table_name with the given row stream inside a single transaction.
+
+    Only the schema sample and one insert batch are held in memory at a time.
+    Date columns get hidden "<col>__date" (ISO) and __year/__month/__day siblings.
+    """
+    with _load_lock:
+        return _ingest_rows(conn, table_name, columns, rows, source)
+
+
+def _ingest_rows(conn, table_name, columns, rows, source):
+    rows = iter(rows)
+    sample = [tuple(_normalize_value(v) for v in row) for row in islice(rows, SCHEMA_SAMPLE_ROWS)]
+    types = infer_schema(columns, sample)
+    date_columns = detect_date_columns(columns, types, sample)
+
+    all_columns, all_types = list(columns), list(types)
+    for i, fmt in date_columns:
+        all_columns += dates.derived_columns(columns[i])
+        all_types += ["TEXT", "INTEGER", "INTEGER", "INTEGER"]
+    column_sql = ", ".join(f'{quote_identifier(c)} {t}' for c, t in zip(all_columns, all_types))
+    placeholders = ", ".join("?" * len(all_columns))
+    insert_sql = f'INSERT INTO {quote_identifier(table_name)} VALUES ({placeholders})'
+
+    stream = chain(sample, (tuple(_normalize_value(v) for v in row) for row in rows))
+    if date_columns:
+        stream = (_with_date_parts(row, date_columns) for row in stream)
+    total = 0
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f'DROP TABLE IF EXISTS {quote_identifier(table_name)}')
+        conn.execute(f'CREATE TABLE {quote_identifier(table_name)} ({column_sql})')
+        while True:
+            batch = list(islice(stream, INSERT_BATCH_ROWS))
+            if not batch:
+                break
+            conn.executemany(insert_sql, batch)
+            total += len(batch)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    aggregate_cache.invalidate_table(table_name)
+    indexer.reset_table(table_name)
+    indexer.build_load_time_indexes(conn, table_name)
+    conn.commit()
+    try:
+        catalog.introspect_table(conn, table_name, source=source)
+    except Exception:
+        logging.exception(f"Could not catalog '{table_name}'")
+    try:
+        columnar.materialize(conn, table_name)
+    except Exception:
+        logging.exception(f"Could not build a columnar copy of '{table_name}'")
+        columnar.remove(table_name)
+    # Again once the columnar copy is in place, in case a query cached SQL results in between.
+    aggregate_cache.invalidate_table(table_name)
+    return total
+
+
+def _csv_rows(filepath, encoding):
+    for chunk in pd.read_csv(filepath, encoding=encoding, chunksize=CSV_CHUNK_ROWS):
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def load_csv(filepath, table_name, db_name="data.db"):
+    """Stream a CSV into SQLite in chunks; returns the number of rows written."""
+    start = time.time()
+    encoding = sniff_encoding(filepath)
+    header = pd.read_csv(filepath, encoding=encoding, nrows=0).columns
+    columns = _dedupe(header)
+    with db_pool.connection(db_name) as conn:
+        total = ingest_rows(conn, table_name, columns, _csv_rows(filepath, encoding),
+                            source=os.path.basename(filepath))
+    logging.info(f"Loaded {total} rows into '{table_name}' ({encoding}) in {time.time() - start:.2f}s")
+    return total
+
+
+def xlsx_table_names(filepath):
+    """Table names load_xlsx would create for a workbook (empty sheets are skipped)."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        return [
+            table_name_for(sheet.title) for sheet in workbook.worksheets
+            if next(sheet.iter_rows(values_only=True, max_row=1), None) is not None
+        ]
+    finally:
+        workbook.close()
+
+
+def load_xlsx(filepath, db_name="data.db"):
+    """Stream every sheet of a workbook into its own table; returns [(sheet_name, table_name)]."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    loaded = []
+    try:
+        with db_pool.connection(db_name) as conn:
+            for sheet in workbook.worksheets:
+                start = time.time()
+                rows = sheet.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    logging.info(f"Skipping empty sheet '{sheet.title}'")
+                    continue
+                columns = _dedupe(header)
+                width = len(columns)
+                body = (
+                    tuple(row[:width]) + (None,) * (width - len(row))
+                    for row in rows
+                    if any(v is not None for v in row)
+                )
+                table_name = table_name_for(sheet.title)
+                total = ingest_rows(conn, table_name, columns, body,
+                                    source=f"{os.path.basename(filepath)}:{sheet.title}")
+                loaded.append((sheet.title, table_name))
+                logging.info(f"Inserted sheet '{sheet.title}' as table '{table_name}' ({total} rows) in {time.time() - start:.2f}s")
+    finally:
+        workbook.close()
+    return loaded
@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))
+
+
+class Job:
+    """Status record for one background ingest job."""
+
+    def __init__(self, kind, description):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.description = description
+        self.status = "queued"
+        self.stage = "queued"
+        self.progress = 0.0
+        self.message = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def update(self, stage=None, progress=None, message=None):
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if progress is not None:
+                self.progress = max(0.0, min(1.0, float(progress)))
+            if message is not None:
+                self.message = message
+            self.updated_at = time.time()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "description": self.description,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": round(self.progress, 4),
+                "message": self.message,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+
+
+class JobManager:
+    """Runs blocking ingest work on a thread pool so the event loop keeps serving /query."""
+
+    def __init__(self, workers=JOB_WORKERS, history=JOB_HISTORY):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()
+        self._active = {}  # dedupe key -> queued or running job
+        self._history = history
+        self._lock = threading.Lock()
+
+    def submit(self, kind, description, fn, *args, key=None, **kwargs):
+        """Queue fn(job, *args, **kwargs); its return value becomes the job message.
+
+        With a key, a job already queued or running under that key is returned instead of
+        starting a second one (e.g. the same upload posted twice).
+        """
+        with self._lock:
+            if key is not None and key in self._active:
+                return self._active[key]
+            job = Job(kind, description)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job
+            self._trim()
+        self._executor.submit(self._run, job, fn, args, kwargs, key)
+        return job
+
+    def active(self, key):
+        """The queued or running job submitted under key, if any."""
+        with self._lock:
+            return self._active.get(key)
+
+    def _run(self, job, fn, args, kwargs, key=None):
+        try:
+            self._execute(job, fn, args, kwargs)
+        finally:
+            if key is not None:
+                with self._lock:
+                    if self._active.get(key) is job:
+                        del self._active[key]
+
+    def _execute(self, job, fn, args, kwargs):
+        with job._lock:
+            job.status = "running"
+            job.updated_at = time.time()
+        start = time.time()
+        try:
+            message = fn(job, *args, **kwargs)
+        except Exception as e:
+            logging.exception(f"Job {job.id} ({job.description}) failed")
+            with job._lock:
+                job.status = "failed"
+                job.stage = "failed"
+                job.error = str(e)
+                job.updated_at = time.time()
+            return
+        with job._lock:
+            job.status = "done"
+            job.stage = "done"
+            job.progress = 1.0
+            if message is not None:
+                job.message = message
+            job.updated_at = time.time()
+        logging.info(f"Job {job.id} ({job.description}) finished in {time.time() - start:.2f}s")
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j.status in ("done", "failed")]
+        while len(self._jobs) > self._history and finished:
+            self._jobs.pop(finished.pop(0), None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait)
+
+
+jobs = JobManager()
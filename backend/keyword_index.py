@@ -0,0 +1,154 @@
+import math
+import os
+import re
+from collections import Counter
+
+from backend import db_pool
+from backend.vector_store import SearchHit
+
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", "keyword_index.db")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Codes like "SKU-1042", "A12_b" or clause numbers like "4.2.1" stay whole; their parts are indexed too.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it its my of on or our "
+    "the this to was we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased terms for BM25: compound codes plus their alphanumeric parts, minus stopwords."""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        token = token.strip(".")
+        if not token:
+            continue
+        parts = re.split(r"[-_./]", token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(p for p in parts if p and p not in _STOPWORDS)
+    return terms
+
+
+def _connection():
+    return db_pool.connection(KEYWORD_INDEX_PATH)
+
+
+def _ensure_schema(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS chunks (
+               chunk_id TEXT PRIMARY KEY,
+               file_name TEXT NOT NULL,
+               text TEXT NOT NULL,
+               length INTEGER NOT NULL
+           )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS chunks_file ON chunks (file_name)")
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS postings (
+               term TEXT NOT NULL,
+               chunk_id TEXT NOT NULL,
+               tf INTEGER NOT NULL,
+               PRIMARY KEY (term, chunk_id)
+           ) WITHOUT ROWID"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id)")
+
+
+def add(file_name, chunk_ids, texts):
+    """Index chunks for a document; existing chunk IDs are replaced."""
+    chunk_ids = [str(c) for c in chunk_ids]
+    if not chunk_ids:
+        return
+    with _connection() as conn:
+        _ensure_schema(conn)
+        _delete_chunks(conn, chunk_ids)
+        rows, postings = [], []
+        for chunk_id, text in zip(chunk_ids, texts):
+            terms = Counter(tokenize(text))
+            rows.append((chunk_id, file_name, text, sum(terms.values())))
+            postings.extend((term, chunk_id, tf) for term, tf in terms.items())
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO postings VALUES (?, ?, ?)", postings)
+
+
+def _delete_chunks(conn, chunk_ids):
+    conn.executemany("DELETE FROM postings WHERE chunk_id = ?", ((c,) for c in chunk_ids))
+    conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", ((c,) for c in chunk_ids))
+
+
+def chunk_ids(file_name):
+    with _connection() as conn:
+        _ensure_schema(conn)
+        return {r[0] for r in conn.execute("SELECT chunk_id FROM chunks WHERE file_name = ?", (file_name,))}
+
+
+def delete_ids(chunk_ids):
+    chunk_ids = [str(c) for c in chunk_ids]
+    if not chunk_ids:
+        return
+    with _connection() as conn:
+        _ensure_schema(conn)
+        _delete_chunks(conn, chunk_ids)
+
+
+def delete_file(file_name):
+    with _connection() as conn:
+        _ensure_schema(conn)
+        conn.execute(
+            "DELETE FROM postings WHERE chunk_id IN (SELECT chunk_id FROM chunks WHERE file_name = ?)",
+            (file_name,),
+        )
+        conn.execute("DELETE FROM chunks WHERE file_name = ?", (file_name,))
+
+
+def search(query, limit=5, file_name=None):
+    """Okapi BM25 over the indexed chunks; returns SearchHit objects like the vector store."""
+    terms = Counter(tokenize(query))
+    if not terms:
+        return []
+    with _connection() as conn:
+        _ensure_schema(conn)
+        total, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+        if not total:
+            return []
+        avg_length = avg_length or 1.0
+        marks = ",".join("?" * len(terms))
+        df = dict(conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({marks}) GROUP BY term", list(terms)
+        ))
+        sql = (
+            f"SELECT p.chunk_id, p.term, p.tf, c.length FROM postings p JOIN chunks c ON c.chunk_id = p.chunk_id "
+            f"WHERE p.term IN ({marks})"
+        )
+        params = list(terms)
+        if file_name is not None:
+            sql += " AND c.file_name = ?"
+            params.append(file_name)
+
+        scores = {}
+        for chunk_id, term, tf, length in conn.execute(sql, params):
+            idf = math.log(1 + (total - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * norm * terms[term]
+        if not scores:
+            return []
+
+        top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        marks = ",".join("?" * len(top))
+        payloads = {
+            chunk_id: {"text": text, "file_name": name}
+            for chunk_id, text, name in conn.execute(
+                f"SELECT chunk_id, text, file_name FROM chunks WHERE chunk_id IN ({marks})", [c for c, _ in top]
+            )
+        }
+        return [SearchHit(chunk_id, score, payloads[chunk_id]) for chunk_id, score in top]
+
+
+def clear():
+    with _connection() as conn:
+        _ensure_schema(conn)
+        conn.execute("DELETE FROM postings")
+        conn.execute("DELETE FROM chunks")
@@ -1,24 +1,37 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from backend import router, sql_handler, doc_handler, embedding, functions, decision, dispatcher
 from backend.sql_handler import get_last_table, set_last_table, get_last_file_type, set_last_file_type,execute_sql_query, quote_column, get_selected_columns, load_csv_to_sqlite
 from backend.router import model
 from backend.functions import functions_prompt, table_metadata, tool_defs
 from backend.embedding import index_document, check_embeddings_exist, extract_text_chunks
 from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from backend.decision import decide_tool_call
 from backend.dispatcher import convert_where_clause, proto_to_dict,dispatch_function
 from backend.doc_handler import extract_docx_text, extract_pdf_text
+from backend.query_cache import query_cache
+from backend.aggregate_cache import aggregate_cache
+from backend import fast_router, db_pool, indexer, ingest
+from backend.jobs import jobs
+from backend import doc_registry, chunking, keyword_index, catalog, prompts, columnar
+from backend.formatter import format_result, stream_format_result
+from backend.renderer import render_result
 import os
 import re
+import asyncio
+import functools
 import logging
 import json
 import sqlite3
 import pandas as pd
 import time
 import io
+import hashlib
+import uuid
 import sys
 import uvicorn
+from concurrent.futures import ThreadPoolExecutor
 
 
 logging.basicConfig(
@@ -32,26 +45,53 @@ logging.basicConfig(
 
 app = FastAPI()
 
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", "16"))
+DISCONNECT_POLL_INTERVAL = 0.25
+STAGE_TIMEOUTS = {
+    "cache": float(os.getenv("CACHE_TIMEOUT", "5")),
+    "decide": float(os.getenv("DECIDE_TIMEOUT", "30")),
+    "dispatch": float(os.getenv("DISPATCH_TIMEOUT", "60")),
+    "format": float(os.getenv("FORMAT_TIMEOUT", "30")),
+}
+# Sync Gemini, SQLite and Qdrant calls run here so the event loop stays free.
+query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
+
 
 @app.on_event("startup")
 def startup_event():
     try:
-        logging.info("Ensuring Qdrant collection exists...")
-        from backend.embedding import ensure_collection_exists
-        ensure_collection_exists(vector_size=3072, collection_name="documents")
-        logging.info("Qdrant collection ready.")
+        logging.info("Ensuring vector collection exists...")
+        from backend.vector_store import get_store
+        get_store("documents").ensure(3072)
+        logging.info("Vector collection ready.")
     except Exception:
         logging.exception("Qdrant collection init error")
 
+@app.on_event("shutdown")
+def shutdown_event():
+    jobs.shutdown(wait=False)
+    query_executor.shutdown(wait=False)
+    db_pool.close_all()
+
+
 @app.post("/reset")
 async def reset_data():
     try:
-        from backend.embedding import client
-        client.delete_collection("documents")
+        from backend.vector_store import get_store
+        get_store("documents").reset()
+        doc_registry.clear()
+        keyword_index.clear()
 
         db_path = "data.db"
-        if os.path.exists(db_path):
-            os.remove(db_path)
+        db_pool.close_all()
+        for path in (db_path, db_path + "-wal", db_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        query_cache.invalidate("reset")
+        indexer.reset_usage()
+        catalog.invalidate()
+        columnar.clear()
+        aggregate_cache.clear()
 
         return {"message": "✅ All data has been reset. Please upload a new file."}
     except Exception as e:
@@ -63,175 +103,415 @@ async def reset_data():
 
 from backend.dispatcher import FUNCTION_REGISTRY 
 
-@app.post("/query")
-async def handle_query(query: str = Form(...)):
+
+def _is_cacheable(function_name, raw_result):
+    """Only cache answers that came from real data, not fallbacks or 'upload first' notices."""
+    if function_name not in ("get_order_details", "get_policy_info"):
+        return False
+    if isinstance(raw_result, str) and raw_result.lower().startswith("please upload"):
+        return False
+    # Data lookups return rows; a string is a QueryError or other failure that must not stick.
+    if function_name == "get_order_details" and not isinstance(raw_result, list):
+        return False
+    return bool(raw_result)
+
+@app.get("/stats")
+def get_stats():
+    return {
+        "fast_router": {**fast_router.stats, "hit_rate": round(fast_router.hit_rate(), 4)},
+        "prompt_tokens": prompts.token_stats(),
+        "query_cache": query_cache.stats,
+        "aggregate_cache": {**aggregate_cache.stats, "entries": len(aggregate_cache)},
+    }
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def run_stage(stage, fn, *args, timeout=None):
+    """Run a blocking call on the query executor, bounded by a per-stage timeout."""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
     try:
-        tool_call = decide_tool_call(query)
-        if not tool_call:
-            return {"response": "Sorry, no relevant function was triggered by the query."}
+        return await asyncio.wait_for(
+            loop.run_in_executor(query_executor, functools.partial(fn, *args)),
+            timeout=timeout or STAGE_TIMEOUTS.get(stage),
+        )
+    except asyncio.TimeoutError:
+        logging.warning(f"Query stage '{stage}' timed out")
+        raise HTTPException(status_code=504, detail=f"Timed out while running the '{stage}' step.")
+    finally:
+        logging.info(f"Stage '{stage}' took {time.perf_counter() - start:.3f}s")
+
+
+async def cancel_on_disconnect(request: Request, coro):
+    """Await coro, cancelling it if the client goes away before it finishes."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
 
-        function_call = tool_call["function_call"]
-        function_name = function_call["name"]
-        args = function_call["arguments"]
 
-        if isinstance(args, str):
-            args = json.loads(args)
-        elif hasattr(args, "items"):
-            args = proto_to_dict(args)
-        elif not isinstance(args, dict):
-            raise ValueError(f"Unexpected type for args: {type(args)} - {args}")
+def lookup_cache(query, llm_format=False):
+    """(cached entry or None, fast-router call or None, cache version) for a query.
 
-        logging.info(f"Dispatching function: {function_name} with args: {args}")
+    The fast router is local and runs first, so the cache's semantic tier (a query-embedding
+    round trip) is only probed for queries that would otherwise go to the LLM. The version is
+    read before the lookup and handed back to store(), so an answer computed across an
+    upload or reset is not cached under the new data.
+    """
+    version = query_cache.version
+    fast_call = fast_router.fast_route(query)
+    cached = query_cache.lookup(query, semantic=fast_call is None, llm_format=llm_format)
+    return cached, fast_call, version
 
-        if function_name in FUNCTION_REGISTRY:
-            raw_result = FUNCTION_REGISTRY[function_name](args)
-        else:
-            raw_result = {"message": f"Function '{function_name}' not supported."}
-        
-        logging.info(f"it is the raw result :{raw_result}")
-        format_prompt = f"""
-        The user asked: {query}
-        The raw function result is: {raw_result}
 
-        Your task: Reformat this into a clear, conversational, user-friendly response.
+def route_query(query, fast_call=None):
+    return fast_call or decide_tool_call(query)
 
-        Guidelines:
-        - If the result looks like structured tabular data (list of dicts), return it as a nice table.
-        - If it's a single value, explain it naturally in one sentence.
-        - If it's unstructured text, return a clean, short answer.
-        - If the user asked a question before uploading any file, politely say: "⚠️ Please upload a file first to answer this query."
-        - Avoid exposing raw JSON or SQL.
 
-        # Examples:
+def normalize_args(args):
+    if isinstance(args, str):
+        return json.loads(args)
+    if hasattr(args, "items"):
+        return proto_to_dict(args)
+    if not isinstance(args, dict):
+        raise ValueError(f"Unexpected type for args: {type(args)} - {args}")
+    return args
 
-        User: "What is the shipping status of order 1001?"
-        Raw Result: [{{"Shipping Status": "Delivered"}}]  
-        Answer: The shipping status of order **1001** is **Delivered**.
 
-        ---
+def _summarize(raw_result, limit=500):
+    """Short log line for a raw result instead of dumping every row."""
+    if isinstance(raw_result, list):
+        return f"{len(raw_result)} rows{' (truncated)' if getattr(raw_result, 'truncated', False) else ''}"
+    text = str(raw_result)
+    return text if len(text) <= limit else text[:limit] + "..."
 
-        User: "Show me total price and sale date from sales details"
-        Raw Result: [
-            {{"Sale Date": "2025-07-01", "Total Price": 500}},
-            {{"Sale Date": "2025-07-02", "Total Price": 700}}
-        ]  
-        Answer: Here are the sales details:
 
-        | Sale Date   | Total Price |
-        |-------------|-------------|
-        | 2025-07-01  | 500         |
-        | 2025-07-02  | 700         |
+def page_info(function_name, args, raw_result):
+    """Paging fields to return alongside a truncated SQL result."""
+    if function_name != "get_order_details" or not getattr(raw_result, "truncated", False):
+        return {}
+    return {
+        "truncated": True,
+        "next_page_token": sql_handler.make_page_token(args, raw_result.next_offset),
+    }
 
-        ---
 
+def run_function(function_name, args):
+    if function_name in FUNCTION_REGISTRY:
+        return FUNCTION_REGISTRY[function_name](args)
+    return {"message": f"Function '{function_name}' not supported."}
 
-        User: "Give me a summary of priya sharma's purchase"
-        Raw Result: [{{'Order ID': 'ORD100', 'Product Name': 'Wireless Mouse', 'Quantity': 2, 'Total Price': 1000, 'Sale Date': '2025-07-04 00:00:00'}}]
-        Answer: Priya Sharma ordered Wireless Mouse on 2025-07-04 00:00:00. She ordered 2 quantities of it for Total Price 1000 and here order id is ORD100.
 
+async def answer_query(query, llm_format=False):
+    cached, fast_call, cache_version = await run_stage("cache", lookup_cache, query, llm_format)
+    if cached is not None:
+        logging.info(f"Query cache hit for: {query}")
+        tool_call = cached["tool_call"]
+        return JSONResponse({
+            "response": cached["response"],
+            **page_info(tool_call["name"], tool_call["arguments"], cached["raw_result"]),
+        })
 
-        ---
+    tool_call = await run_stage("decide", route_query, query, fast_call)
+    if not tool_call:
+        return {"response": "Sorry, no relevant function was triggered by the query."}
 
-        User: "Tell me about the refund policy"
-        Raw Result: "Our refund policy allows returns within 30 days."  
-        Answer: Our refund policy allows returns **within 30 days**.
+    function_call = tool_call["function_call"]
+    function_name = function_call["name"]
+    args = normalize_args(function_call["arguments"])
 
-        ---
+    logging.info(f"Dispatching function: {function_name} with args: {args}")
+    raw_result = await run_stage("dispatch", run_function, function_name, args)
+    logging.info(f"Raw result: {_summarize(raw_result)}")
 
-        User: "Can you calculate profit margin?"
-        Raw Result: "Sorry, I need the uploaded file to answer this."  
-        Answer: Please upload a file first to answer queries about data.
+    formatted = None if llm_format else render_result(function_name, raw_result, args)
+    if formatted is None:
+        formatted = await run_stage("format", format_result, query, raw_result)
 
-        ---
+    if _is_cacheable(function_name, raw_result):
+        try:
+            await run_stage("cache", query_cache.store, query, {"name": function_name, "arguments": args},
+                            raw_result, formatted, cache_version, llm_format)
+        except HTTPException:
+            logging.warning("Skipped caching answer after cache store timeout")
 
-        Now, reformat the given raw result for this query accordingly:
-        """
+    return JSONResponse({"response": formatted, **page_info(function_name, args, raw_result)})
 
-        llm_response = model.generate_content(format_prompt)
-        formatted = llm_response.candidates[0].content.parts[0].text
 
-        return JSONResponse({"response": formatted})
+@app.post("/query")
+async def handle_query(request: Request, query: str = Form(...), llm_format: bool = Form(False)):
+    try:
+        return await cancel_on_disconnect(request, answer_query(query, llm_format))
 
+    except ClientDisconnected:
+        logging.info(f"Client disconnected; abandoned query: {query}")
+        return Response(status_code=499)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.exception("Query error")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+@app.post("/query/page")
+async def fetch_query_page(page_token: str = Form(...)):
+    """Next page of rows for a truncated get_order_details result."""
     try:
-        filepath = f"uploads/{file.filename}"
-        logging.info(f"Starting upload for file: {file.filename}")
-        os.makedirs("uploads", exist_ok=True)
-        filepath = os.path.join("uploads", file.filename)
-        file_already_exists = os.path.exists(filepath)
+        args, offset = sql_handler.read_page_token(page_token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+    rows = await run_stage("dispatch", dispatcher.get_order_details, args, offset)
+    if isinstance(rows, str):
+        return {"rows": [], "message": rows}
+    if getattr(rows, "error", None):
+        raise HTTPException(status_code=500, detail="Could not fetch the next page of results.")
+    return {"rows": rows, "offset": offset, **page_info("get_order_details", args, rows)}
 
-        if file_already_exists:
-            logging.warning("File already exists.")
 
-            if not check_embeddings_exist(file.filename):
-                logging.info("Embeddings not found in Qdrant. Reprocessing the file...")
-                filepath = f"uploads/{file.filename}"
-                text_chunks = extract_text_chunks(filepath)
-                index_document(text_chunks, file.filename)
+STREAM_ROWS_PER_EVENT = 200
 
-            else:
-                logging.info("Embeddings already exist. Skipping reprocessing.")
 
+def sse_event(event, data):
+    """Encode one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
 
-            return {"message": "File already exists, no changes made."}
-        
-        with open(filepath, "wb") as f:
-            f.write(await file.read())
-        logging.info(f"File saved at: {filepath}")
-        msg = "File processed successfully."
-
-        if file.filename.endswith(".csv"):
-            raw_name = os.path.splitext(file.filename)[0]
-            table_name = re.sub(r'\W+', '_', raw_name).strip('_').lower()
-            logging.info(f"Processing CSV: {table_name}")
-            sql_handler.load_csv_to_sqlite(filepath, table_name)
-            set_last_table(table_name)
-            set_last_file_type("csv")
-            msg = f"CSV uploaded and indexed in SQLite as '{table_name}'."
-
-        elif file.filename.endswith(".xlsx"):
-            logging.info("Processing Excel with multiple sheets...")
-            xls = pd.ExcelFile(filepath)
-            conn = sqlite3.connect("data.db")
-            for sheet_name in xls.sheet_names:
-                start = time.time()
-                df = pd.read_excel(xls, sheet_name=sheet_name)
-
-            
-                table_name = re.sub(r'\W+', '_', sheet_name).strip('_').lower()
-                df.to_sql(table_name, conn, if_exists="replace", index=False, chunksize=1000)
-                logging.info(f"Inserted sheet '{sheet_name}' as table '{table_name}' in {time.time() - start:.2f}s")
-            conn.close()
-            set_last_table(xls.sheet_names[0])
-            set_last_file_type("xlsx")
-            msg = f"Excel file uploaded. Sheets saved as tables: {xls.sheet_names}"
-
-        elif file.filename.endswith(".pdf"):
-            logging.info("Extracting PDF...")
-            text = doc_handler.extract_pdf_text(filepath)
-            embedding.index_document(text.split(". "), file.filename)
-            set_last_file_type("pdf")
-            msg = "PDF uploaded and indexed."
-
-        elif file.filename.endswith(".docx"):
-            logging.info("Extracting DOCX...")
-            text = doc_handler.extract_docx_text(filepath)
-            embedding.index_document(text.split(". "))
-            set_last_file_type("docx")
-            msg = "DOCX uploaded and indexed."
 
+async def iterate_in_executor(gen_fn, *args):
+    """Drive a blocking generator on the query executor and yield its items asynchronously."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    cancelled = False
+
+    def produce():
+        try:
+            for item in gen_fn(*args):
+                if cancelled:
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    loop.run_in_executor(query_executor, produce)
+    try:
+        while True:
+            item = await asyncio.wait_for(queue.get(), timeout=STAGE_TIMEOUTS["format"])
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled = True
+
+
+async def stream_answer(request: Request, query, llm_format=False):
+    try:
+        cached, fast_call, cache_version = await run_stage("cache", lookup_cache, query, llm_format)
+        if cached is not None:
+            yield sse_event("decision", {**cached["tool_call"], "cached": True})
+            yield sse_event("answer", {"response": cached["response"]})
+            yield sse_event("done", {})
+            return
+
+        tool_call = await run_stage("decide", route_query, query, fast_call)
+        if not tool_call:
+            yield sse_event("answer", {"response": "Sorry, no relevant function was triggered by the query."})
+            yield sse_event("done", {})
+            return
+
+        function_name = tool_call["function_call"]["name"]
+        args = normalize_args(tool_call["function_call"]["arguments"])
+        yield sse_event("decision", {"name": function_name, "arguments": args})
+
+        raw_result = await run_stage("dispatch", run_function, function_name, args)
+        if isinstance(raw_result, list):
+            for i in range(0, len(raw_result), STREAM_ROWS_PER_EVENT):
+                yield sse_event("rows", {"rows": raw_result[i:i + STREAM_ROWS_PER_EVENT]})
+        if await request.is_disconnected():
+            logging.info(f"Client disconnected before formatting: {query}")
+            return
+
+        formatted = None if llm_format else render_result(function_name, raw_result, args)
+        if formatted is not None:
+            yield sse_event("token", {"text": formatted})
         else:
+            parts = []
+            async for token in iterate_in_executor(stream_format_result, query, raw_result):
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+            formatted = "".join(parts)
+
+        if _is_cacheable(function_name, raw_result):
+            await run_stage("cache", query_cache.store, query, {"name": function_name, "arguments": args},
+                            raw_result, formatted, cache_version, llm_format)
+        yield sse_event("done", page_info(function_name, args, raw_result))
+
+    except HTTPException as e:
+        yield sse_event("error", {"error": e.detail})
+    except asyncio.TimeoutError:
+        yield sse_event("error", {"error": "Timed out while generating the answer."})
+    except Exception as e:
+        logging.exception("Streaming query error")
+        yield sse_event("error", {"error": str(e)})
+
+
+@app.post("/query/stream")
+async def handle_query_stream(request: Request, query: str = Form(...), llm_format: bool = Form(False)):
+    return StreamingResponse(
+        stream_answer(request, query, llm_format),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+SUPPORTED_EXTENSIONS = (".csv", ".xlsx", ".pdf", ".docx")
+
+
+def _progress(job, stage, lo, hi):
+    """Map a (done, total) callback onto the [lo, hi] slice of the job's progress bar."""
+    def report(done, total=None):
+        fraction = done / total if total else 0.0
+        job.update(stage=stage, progress=lo + (hi - lo) * fraction)
+    return report
+
+
+def process_upload(job, filepath, filename, content_hash=None):
+    """Parse and index an uploaded file; runs on the background job pool."""
+    job.update(stage="parsing", progress=0.05)
+
+    if filename.endswith(".csv"):
+        raw_name = os.path.splitext(filename)[0]
+        table_name = ingest.table_name_for(raw_name)
+        logging.info(f"Processing CSV: {table_name}")
+        sql_handler.load_csv_to_sqlite(filepath, table_name)
+        set_last_table(table_name)
+        set_last_file_type("csv")
+        msg = f"CSV uploaded and indexed in SQLite as '{table_name}'."
+
+    elif filename.endswith(".xlsx"):
+        logging.info("Processing Excel with multiple sheets...")
+        sheets = ingest.load_xlsx(filepath)
+        sheet_names = [sheet for sheet, _ in sheets]
+        if sheets:
+            set_last_table(sheets[0][1])
+        set_last_file_type("xlsx")
+        msg = f"Excel file uploaded. Sheets saved as tables: {sheet_names}"
+
+    elif filename.endswith(".pdf"):
+        logging.info("Extracting PDF...")
+        pages = doc_handler.iter_pdf_pages(filepath, on_progress=_progress(job, "extracting", 0.0, 0.2))
+        chunks = chunking.chunk_pages(pages)
+        job.update(stage="embedding", progress=0.2)
+        embedding.index_document(chunks, filename, on_progress=_progress(job, "embedding", 0.2, 1.0),
+                                 content_hash=content_hash)
+        set_last_file_type("pdf")
+        msg = "PDF uploaded and indexed."
+
+    elif filename.endswith(".docx"):
+        logging.info("Extracting DOCX...")
+        chunks = chunking.chunk_blocks(doc_handler.extract_docx_blocks(filepath))
+        job.update(stage="embedding", progress=0.2)
+        embedding.index_document(chunks, filename, on_progress=_progress(job, "embedding", 0.2, 1.0),
+                                 content_hash=content_hash)
+        set_last_file_type("docx")
+        msg = "DOCX uploaded and indexed."
+
+    else:
+        raise ValueError("Unsupported file type.")
+
+    query_cache.invalidate(f"uploaded {filename}")
+    return msg
+
+
+def _save_upload(file, filepath):
+    """Stream the upload to disk and return the sha256 of its bytes."""
+    h = hashlib.sha256()
+    with open(filepath, "wb") as f:
+        for block in iter(lambda: file.file.read(1024 * 1024), b""):
+            h.update(block)
+            f.write(block)
+    return h.hexdigest()
+
+
+def _is_document(filename):
+    return filename.endswith((".pdf", ".docx"))
+
+
+def _already_loaded(filename, filepath, content_hash):
+    """True when this exact content is already indexed (documents) or loaded (tables)."""
+    if _is_document(filename):
+        entry = doc_registry.get(filename)
+        if entry is not None:
+            return entry["content_hash"] == content_hash and check_embeddings_exist(filename)
+        return (
+            os.path.exists(filepath)
+            and doc_registry.file_hash(filepath) == content_hash
+            and check_embeddings_exist(filename)
+        )
+
+    if not os.path.exists(filepath) or doc_registry.file_hash(filepath) != content_hash:
+        return False
+    if not os.path.exists("data.db"):
+        return False
+    if filename.endswith(".csv"):
+        table_names = [ingest.table_name_for(os.path.splitext(filename)[0])]
+    else:
+        table_names = ingest.xlsx_table_names(filepath)
+    # A reset or another upload may have dropped some of the tables since this file was loaded.
+    existing = set(sql_handler.list_tables())
+    return all(name in existing for name in table_names)
+
+
+@app.post("/upload")
+async def upload_file(file: UploadFile = File(...)):
+    """202 with a job id when the file is queued for processing; 200 when it is already loaded."""
+    try:
+        logging.info(f"Starting upload for file: {file.filename}")
+        if not file.filename.endswith(SUPPORTED_EXTENSIONS):
             raise HTTPException(400, "Unsupported file type.")
 
-        return {"message": msg}
+        os.makedirs("uploads", exist_ok=True)
+        filepath = os.path.join("uploads", file.filename)
+        partial_path = os.path.join("uploads", f".{uuid.uuid4().hex}.part")
+
+        content_hash = await run_in_threadpool(_save_upload, file, partial_path)
+        job_key = (file.filename, content_hash)
+        running = jobs.active(job_key)
+        if running is not None:
+            # Streamlit re-posts the file on every rerun; report the job already in flight.
+            os.remove(partial_path)
+            return JSONResponse(
+                status_code=202,
+                content={"message": f"Upload of '{file.filename}' is already being processed.", "job_id": running.id},
+            )
+        if await run_in_threadpool(_already_loaded, file.filename, filepath, content_hash):
+            os.remove(partial_path)
+            logging.info(f"'{file.filename}' is unchanged and already indexed. Skipping reprocessing.")
+            return {"message": "File already exists, no changes made."}
+
+        os.replace(partial_path, filepath)
+        logging.info(f"File saved at: {filepath}")
+
+        job = jobs.submit("upload", file.filename, process_upload, filepath, file.filename, content_hash, key=job_key)
+        return JSONResponse(
+            status_code=202,
+            content={"message": f"Upload of '{file.filename}' accepted; processing in the background.", "job_id": job.id},
+        )
 
     except HTTPException:
         raise
@@ -240,6 +520,28 @@ async def upload_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/documents")
+def list_documents():
+    return {"documents": doc_registry.list_documents()}
+
+
+@app.delete("/documents/{file_name}")
+def delete_document(file_name: str):
+    if doc_registry.get(file_name) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document '{file_name}'.")
+    embedding.delete_document(file_name)
+    query_cache.invalidate(f"deleted {file_name}")
+    return {"message": f"Removed '{file_name}' from the index."}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'.")
+    return job.to_dict()
+
+
 @app.exception_handler(Exception)
 async def handle_unexpected_exceptions(request, exc):
     if isinstance(exc, HTTPException):
@@ -248,5 +550,8 @@ async def handle_unexpected_exceptions(request, exc):
 
 
 if __name__ == "__main__":
+    # Development only: spawned PDF workers re-import this script, building an app and
+    # clients per worker. Use `python -m backend` or `uvicorn backend.main:app` instead.
+    logging.warning("Started as a script; prefer `python -m backend` (see backend/__main__.py).")
     port = int(os.environ.get("PORT", 8001))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
@@ -0,0 +1,27 @@
+"""PDF page extraction run inside doc_handler's worker processes.
+
+Spawned workers import this module (and the parent's __main__, see backend/__main__.py),
+so it must stay free of side effects: no app, model or database clients at import time.
+"""
+try:
+    import fitz
+except ImportError:  # PyMuPDF is optional; PyPDF2 is the fallback
+    fitz = None
+
+
+def iter_page_range(filepath, backend, start, stop):
+    if backend == "fitz":
+        with fitz.open(filepath) as doc:
+            for i in range(start, stop):
+                yield doc.load_page(i).get_text()
+    else:
+        from PyPDF2 import PdfReader
+        with open(filepath, "rb") as f:
+            reader = PdfReader(f)
+            for i in range(start, stop):
+                yield reader.pages[i].extract_text() or ""
+
+
+def extract_page_range(filepath, backend, start, stop):
+    """Worker-process entry point: text of pages [start, stop)."""
+    return list(iter_page_range(filepath, backend, start, stop))
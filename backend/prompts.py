@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import google.generativeai as genai
+
+from backend.functions import functions_prompt
+
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+# Explicit context caching for each model's static prefix (system instruction + tools).
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "1") == "1"
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+# Recreate the cache this many seconds before it expires rather than racing the expiry.
+PROMPT_CACHE_REFRESH_MARGIN = 120
+# After a failed cache creation, send the prefix inline for this long (doubling per failure, up to the TTL).
+PROMPT_CACHE_RETRY = int(os.getenv("PROMPT_CACHE_RETRY", "60"))
+# Gemini refuses to cache less than this (1,024 tokens for 2.5 Flash, 4,096 for 2.5 Pro).
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "4096" if "pro" in MODEL_NAME else "1024"))
+
+DECISION_RULES = """You are an intelligent assistant that answers user questions using both structured and unstructured data.  
+You must decide when to generate SQL queries for structured tables and when to use semantic search for unstructured text.  
+Always choose the most reliable method depending on the query. It should not be case sensitive.
+
+General Rules:
+1. Structured Data (SQL / Tables)  
+   - Use the provided table metadata to map user queries to correct tables and columns. 
+   - If the user query provides an incomplete date (like "July 4th" without a year), 
+  interpret it flexibly:
+    • Match all years for that month/day. Example: "July 4th" → any row where Sale Date LIKE '%-07-04'.  
+    • Match a whole month if only the month is provided. Example: "July 2025" → any row where Sale Date LIKE '2025-07%'.  
+    • Match across all years if only the month is provided without year. Example: "July" → any row where Sale Date LIKE '%-07-%'.  
+   - Normalize data formats:  
+     • Dates → always `YYYY-MM-DD`. Even when the year is not mentioned in query from user, give results related to that.  
+     • Numeric values → ensure correct math (SUM, AVG, MIN, MAX, COUNT).  
+     • Text fields → support filtering and grouping (e.g., Category, Country, Payment Method).
+  Date & datetime rules:
+- If the user gives a full date (YYYY-MM-DD), generate an equality on the date portion:
+    DATE("<column>") = 'YYYY-MM-DD'
+  This matches values stored as 'YYYY-MM-DD' and 'YYYY-MM-DD HH:MM:SS'.
+- If the user gives a month & day (e.g. "July 4") or a partial date without year, match month/day across all years:
+    strftime('%m-%d', "<column>") = '07-04'
+- If the user gives a month (e.g. "July 2025" or "July"), use:
+    • year+month -> strftime('%Y-%m', "<column>") = '2025-07'
+    • month only   -> strftime('%m', "<column>") = '07' (or use LIKE on text)
+- For date ranges use BETWEEN or `DATE("<col>") BETWEEN 'start' AND 'end'`.
+- **Do not** append COLLATE NOCASE to DATE(...) or strftime(...) expressions. Dates are compared by DATE/strftime, not by collation.
+   - Resolve ambiguity using column descriptions.  
+   - If the user query implies comparison, totals, averages, or grouping, build the SQL query accordingly.  
+   - Return the result in a clean, user-friendly format, not raw SQL.
+
+2. Unstructured Data (Documents, Policies, Notes) 
+   - Use semantic search (via embeddings) when the question is about documents, policies, product manuals, or unstructured text.  
+   - Retrieve the most relevant chunks of text and answer in clear natural language.  
+   - If exact information is not found, return the closest relevant context, but **do not hallucinate**. Clearly state when information is missing.
+
+3. When Both Could Apply  
+   - If a question can be answered from either structured or unstructured data, prefer structured data (SQL) first for accuracy.  
+   - If structured data has no match, fall back to unstructured data search.
+
+4. Formatting the Answer  
+   - Keep responses concise and easy to read.  
+   - Use tables for tabular results, plain text for policy explanations.  
+   - Never expose raw SQL unless explicitly asked.  
+   - Always explain the result in natural language."""
+
+FORMAT_INSTRUCTIONS = """Your task: Reformat the raw function result you are given into a clear, conversational, user-friendly response.
+
+Guidelines:
+- If the result looks like structured tabular data (list of dicts), return it as a nice table.
+- If it's a single value, explain it naturally in one sentence.
+- If it's unstructured text, return a clean, short answer.
+- If the user asked a question before uploading any file, politely say: "⚠️ Please upload a file first to answer this query."
+- Avoid exposing raw JSON or SQL.
+
+# Examples:
+
+User: "What is the shipping status of order 1001?"
+Raw Result: [{"Shipping Status": "Delivered"}]  
+Answer: The shipping status of order **1001** is **Delivered**.
+
+---
+
+User: "Show me total price and sale date from sales details"
+Raw Result: [
+    {"Sale Date": "2025-07-01", "Total Price": 500},
+    {"Sale Date": "2025-07-02", "Total Price": 700}
+]  
+Answer: Here are the sales details:
+
+| Sale Date   | Total Price |
+|-------------|-------------|
+| 2025-07-01  | 500         |
+| 2025-07-02  | 700         |
+
+---
+
+
+User: "Give me a summary of priya sharma's purchase"
+Raw Result: [{'Order ID': 'ORD100', 'Product Name': 'Wireless Mouse', 'Quantity': 2, 'Total Price': 1000, 'Sale Date': '2025-07-04 00:00:00'}]
+Answer: Priya Sharma ordered Wireless Mouse on 2025-07-04 00:00:00. She ordered 2 quantities of it for Total Price 1000 and here order id is ORD100.
+
+
+---
+
+User: "Tell me about the refund policy"
+Raw Result: "Our refund policy allows returns within 30 days."  
+Answer: Our refund policy allows returns **within 30 days**.
+
+---
+
+User: "Can you calculate profit margin?"
+Raw Result: "Sorry, I need the uploaded file to answer this."  
+Answer: Please upload a file first to answer queries about data.
+
+---"""
+
+QA_INSTRUCTIONS = (
+    "You are an intelligent assistant. Based on the provided document content, "
+    "answer the question concisely and clearly."
+)
+
+DECISION_INSTRUCTION = functions_prompt + "\n\n" + DECISION_RULES
+
+
+def decision_prompt(user_query, table_metadata):
+    """Per-query part of the routing prompt; the rules live in the (cached) system instruction."""
+    return f"""The metadata below contains table schemas and descriptions. Use them only when SQL is required.
+
+Here is the table metadata you can use:
+{json.dumps(table_metadata, separators=(",", ":"), ensure_ascii=False)}
+
+User query: {user_query}"""
+
+
+def format_prompt(query, raw_result):
+    return f"""The user asked: {query}
+The raw function result is: {raw_result}
+
+Now, reformat the given raw result for this query accordingly:"""
+
+
+def qa_prompt(query, context):
+    return f"""Document Content:
+\"\"\"
+{context}
+\"\"\"
+
+Question: {query}
+Answer:"""
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record_usage(name, response):
+    """Add a response's token counts to the per-model totals and log them."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    with _stats_lock:
+        entry = _stats.setdefault(name, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0})
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["cached_tokens"] += cached_tokens
+        entry["output_tokens"] += output_tokens
+    logging.info(f"{name} call: {prompt_tokens} prompt tokens ({cached_tokens} cached), {output_tokens} output tokens")
+
+
+def token_stats():
+    """Per-model token totals plus average prompt tokens per request."""
+    with _stats_lock:
+        return {
+            name: {**entry, "avg_prompt_tokens": round(entry["prompt_tokens"] / entry["calls"], 1)}
+            for name, entry in _stats.items()
+            if entry["calls"]
+        }
+
+
+class PromptModel:
+    """A Gemini model whose static prefix is sent once through context caching.
+
+    Falls back to a plain model with the same system instruction and tools when
+    caching is disabled, when the prefix is below the provider's minimum cacheable
+    size (counted once, on first use), while the cache is being created, or after
+    the provider rejects it; creation is retried with backoff. Call it like
+    GenerativeModel.generate_content.
+    """
+
+    def __init__(self, name, system_instruction, tools=None, model_name=MODEL_NAME):
+        self.name = name
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.model_name = model_name
+        self._plain = None
+        self._cached = None
+        self._cached_model = None
+        self._cache_expires = 0.0
+        # A token is at least one character, so a short prefix without tools is known to be too small.
+        too_small = tools is None and len(system_instruction) < PROMPT_CACHE_MIN_TOKENS
+        self._cache_disabled = not PROMPT_CACHE_ENABLED or too_small
+        self._sized = too_small
+        self._creating = False
+        self._failures = 0
+        self._retry_after = 0.0
+        self._lock = threading.Lock()
+
+    def _plain_model(self):
+        if self._plain is None:
+            self._plain = genai.GenerativeModel(
+                model_name=self.model_name, system_instruction=self.system_instruction, tools=self.tools
+            )
+        return self._plain
+
+    def _large_enough(self):
+        """Whether the prefix meets PROMPT_CACHE_MIN_TOKENS; assumed so if it cannot be counted."""
+        try:
+            tokens = self._plain_model().count_tokens(".").total_tokens
+        except Exception as e:
+            logging.warning(f"Could not count prefix tokens for '{self.name}' ({e}); trying to cache it anyway.")
+            return True
+        if tokens < PROMPT_CACHE_MIN_TOKENS:
+            logging.info(f"Prefix of '{self.name}' is {tokens} tokens, below the {PROMPT_CACHE_MIN_TOKENS}-token "
+                         f"caching minimum; sending it inline.")
+            return False
+        return True
+
+    def _model(self):
+        with self._lock:
+            if self._cache_disabled:
+                return self._plain_model()
+            now = time.time()
+            fresh = self._cached_model is not None and now < self._cache_expires - PROMPT_CACHE_REFRESH_MARGIN
+            if fresh or self._creating or now < self._retry_after:
+                # While another request (re)creates the cache, use what is there rather than wait.
+                if self._cached_model is not None and now < self._cache_expires:
+                    return self._cached_model
+                return self._plain_model()
+            self._creating = True
+        # The count and create calls are network round trips; keep them outside the lock.
+        if not self._sized:
+            large_enough = self._large_enough()
+            with self._lock:
+                self._sized = True
+                self._cache_disabled = not large_enough
+                if not large_enough:
+                    self._creating = False
+                    return self._plain_model()
+        try:
+            cached = genai.caching.CachedContent.create(
+                model=f"models/{self.model_name}",
+                display_name=f"{self.name}-prefix",
+                system_instruction=self.system_instruction,
+                tools=self.tools,
+                ttl=PROMPT_CACHE_TTL,
+            )
+            cached_model = genai.GenerativeModel.from_cached_content(cached)
+        except Exception as e:
+            with self._lock:
+                self._creating = False
+                self._failures += 1
+                delay = min(PROMPT_CACHE_RETRY * 2 ** (self._failures - 1), PROMPT_CACHE_TTL)
+                self._retry_after = time.time() + delay
+            logging.warning(f"Prompt caching unavailable for '{self.name}' ({e}); sending the prefix inline, "
+                            f"retrying in {delay}s.")
+            return self._plain_model()
+        with self._lock:
+            self._cached, self._cached_model = cached, cached_model
+            self._cache_expires = time.time() + PROMPT_CACHE_TTL
+            self._creating = False
+            self._failures = 0
+        logging.info(f"Created prompt cache for '{self.name}' ({cached.name})")
+        return cached_model
+
+    def _drop_cache(self, error):
+        with self._lock:
+            logging.warning(f"Prompt cache for '{self.name}' failed ({error}); recreating on the next call.")
+            self._cached_model = None
+            self._cache_expires = 0.0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        model = self._model()
+        try:
+            response = model.generate_content(prompt, stream=stream, **kwargs)
+        except Exception as e:
+            if model is not self._cached_model:
+                raise
+            # The cache can be evicted server-side before its TTL; retry once without it.
+            self._drop_cache(e)
+            response = self._plain_model().generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._stream(response)
+        record_usage(self.name, response)
+        return response
+
+    def _stream(self, response):
+        last = None
+        for chunk in response:
+            last = chunk
+            yield chunk
+        if last is not None:
+            record_usage(self.name, last)
@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000"))
+# Off by default in keyword-only retrieval, which promises no query-embedding round trip.
+QUERY_CACHE_SEMANTIC = os.getenv(
+    "QUERY_CACHE_SEMANTIC", "0" if os.getenv("RETRIEVAL_MODE", "hybrid").lower() == "keyword" else "1"
+) == "1"
+QUERY_CACHE_SIMILARITY = float(os.getenv("QUERY_CACHE_SIMILARITY", "0.95"))
+# Data lookups differ by entity or filter in ways embeddings barely register; exact-match only.
+SEMANTIC_EXCLUDED_TOOLS = {"get_order_details"}
+# "t" covers contractions, which normalize_query splits ("isn't" -> "isn t").
+_NEGATIONS = {"not", "no", "never", "none", "nor", "without", "except", "excluding", "t"}
+# Comparison words flip a filter as surely as "<" vs ">" do.
+_COMPARISONS = {"above", "below", "over", "under", "more", "less", "greater", "fewer", "before", "after"}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially different phrasings share a key.
+
+    Comparison operators and decimal points carry meaning ("> 1.5" is not "< 15"), so they are
+    kept, with operators split off as their own tokens.
+    """
+    text = re.sub(r"[^\w\s%<>=!.-]", " ", query.lower())
+    text = re.sub(r"(?<!\d)\.|\.(?!\d)", " ", text)
+    text = re.sub(r"([<>=!]+)", r" \1 ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _identifiers(normalized: str) -> frozenset:
+    """Tokens that carry literal values (order IDs, numbers, dates), comparisons or negation; must match exactly."""
+    return frozenset(
+        tok for tok in normalized.split()
+        if tok in _NEGATIONS or tok in _COMPARISONS or any(ch.isdigit() or ch in "<>=!" for ch in tok)
+    )
+
+
+def _default_embed(text):
+    from backend.embedding import embed_batch
+    return embed_batch([text], task_type="retrieval_query")[0]
+
+
+class QueryCache:
+    """Two-tier /query answer cache: exact normalized match, then embedding similarity.
+
+    Entries are dropped wholesale by invalidate(), which the upload and reset
+    endpoints call whenever the underlying tables or document collection change.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, semantic=QUERY_CACHE_SEMANTIC,
+                 threshold=QUERY_CACHE_SIMILARITY, embed_fn=None):
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.threshold = threshold
+        self.embed_fn = embed_fn or _default_embed
+        self.version = 0
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._entries = OrderedDict()
+        self._vectors = {}
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+
+    def _embed(self, normalized):
+        try:
+            vec = np.asarray(self.embed_fn(normalized), dtype=np.float32)
+        except Exception:
+            logging.exception("Query cache embedding failed; semantic tier skipped")
+            return None
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else None
+
+    def _rebuild_matrix(self):
+        self._matrix_keys = list(self._vectors)
+        self._matrix = np.stack([self._vectors[k] for k in self._matrix_keys]) if self._matrix_keys else None
+
+    def lookup(self, query: str, semantic=True, llm_format=False):
+        """Return the cached entry for a query, or None on a miss.
+
+        The semantic tier costs an embedding call per miss, so it is skipped when the caller
+        says so (e.g. the fast router already resolved the query) and for queries carrying
+        literal values, which are mostly data lookups the tier never stores.
+        """
+        text = normalize_query(query)
+        key = (text, bool(llm_format))
+        idents = _identifiers(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry
+            semantic = semantic and self.semantic and not idents and bool(self._vectors)
+            version = self.version
+
+        if semantic:
+            vec = self._embed(text)
+            if vec is not None:
+                with self._lock:
+                    if version == self.version and self._vectors:
+                        if self._matrix is None:
+                            self._rebuild_matrix()
+                        scores = self._matrix @ vec
+                        for idx in np.argsort(scores)[::-1]:
+                            if scores[idx] < self.threshold:
+                                break
+                            candidate = self._matrix_keys[idx]
+                            if candidate[1] != key[1]:
+                                continue
+                            entry = self._entries.get(candidate)
+                            if entry is not None and entry["identifiers"] == idents:
+                                self._entries.move_to_end(candidate)
+                                self.stats["semantic_hits"] += 1
+                                logging.info(f"Semantic cache hit ({scores[idx]:.3f}): '{text}' ~ '{candidate[0]}'")
+                                return entry
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def store(self, query: str, tool_call, raw_result, response, version=None, llm_format=False):
+        """Cache the tool call, raw function result and formatted answer for a query.
+
+        version is the cache version read before the query was looked up; if an invalidation
+        has happened since, the answer may reflect the old data and is dropped.
+        """
+        text = normalize_query(query)
+        key = (text, bool(llm_format))
+        with self._lock:
+            if version is None:
+                version = self.version
+            elif version != self.version:
+                return
+        semantic = self.semantic and (tool_call or {}).get("name") not in SEMANTIC_EXCLUDED_TOOLS
+        vec = self._embed(text) if semantic else None
+
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = {
+                "tool_call": tool_call,
+                "raw_result": raw_result,
+                "response": response,
+                "identifiers": _identifiers(text),
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            if vec is not None:
+                self._vectors[key] = vec
+                self._matrix = None
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                if self._vectors.pop(old_key, None) is not None:
+                    self._matrix = None
+
+    def invalidate(self, reason=""):
+        """Drop every cached answer; called when uploaded data or documents change."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._vectors.clear()
+            self._matrix = None
+            self._matrix_keys = []
+        logging.info(f"Query cache invalidated{': ' + reason if reason else ''}")
+
+
+query_cache = QueryCache()
@@ -0,0 +1,137 @@
+import os
+import re
+
+from backend import catalog
+
+RENDER_MAX_ROWS = int(os.getenv("RENDER_MAX_ROWS", "50"))
+UPLOAD_FIRST = "⚠️ Please upload a file first to answer this query."
+QUERY_FAILED = "⚠️ Something went wrong while querying the uploaded data. Please try again."
+
+_AGG_RE = re.compile(r'^\s*(COUNT|SUM|AVG|MIN|MAX)\s*\(\s*"?(.+?)"?\s*\)\s*$', re.IGNORECASE)
+_AGG_WORDS = {"COUNT": "number of", "SUM": "total", "AVG": "average", "MIN": "minimum", "MAX": "maximum"}
+
+
+def _descriptions(table_name):
+    for table in catalog.table_metadata().get("tables", []):
+        if table_name and table["Name"].lower() == table_name.lower():
+            return {c["Name"]: c.get("Description", "") for c in table.get("Columns", [])}
+    return {}
+
+
+def format_value(value):
+    if value is None:
+        return "—"
+    if isinstance(value, float):
+        return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}"
+    if isinstance(value, int) and not isinstance(value, bool):
+        return f"{value:,}" if abs(value) >= 10000 else str(value)
+    return str(value)
+
+
+def _aggregate_parts(column):
+    """(aggregate word or None, subject) for an aggregate column, or None for a plain column."""
+    match = _AGG_RE.match(column)
+    if not match:
+        return None
+    subject = "records" if match.group(2) == "*" else match.group(2)
+    word = _AGG_WORDS[match.group(1).upper()]
+    # SUM("Total Price") is just "Total Price", not "Total Total Price".
+    if subject.lower().split()[:len(word.split())] == word.split():
+        return None, subject
+    return word, subject
+
+
+def column_label(column):
+    """Readable name for a result column, e.g. 'AVG("Unit Price")' -> 'Average Unit Price'."""
+    parts = _aggregate_parts(column)
+    if parts is None:
+        return column
+    word, subject = parts
+    return f"{word.capitalize()} {subject}" if word else subject
+
+
+def _cell(value):
+    return format_value(value).replace("|", "\\|").replace("\n", " ")
+
+
+def markdown_table(rows, max_rows=RENDER_MAX_ROWS):
+    headers = list(rows[0].keys())
+    lines = [
+        "| " + " | ".join(column_label(h) for h in headers) + " |",
+        "|" + "|".join("---" for _ in headers) + "|",
+    ]
+    for row in rows[:max_rows]:
+        lines.append("| " + " | ".join(_cell(row.get(h)) for h in headers) + " |")
+    if len(rows) > max_rows:
+        lines.append("")
+        lines.append(f"_Showing the first {max_rows} of {len(rows)} rows._")
+    return "\n".join(lines)
+
+
+def _filter_text(where):
+    if not isinstance(where, dict) or not where:
+        return ""
+    return " for " + " and ".join(f"{k} **{v}**" for k, v in where.items())
+
+
+def _legend(columns, descriptions):
+    described = [(c, descriptions[c]) for c in columns if descriptions.get(c)]
+    if not described or len(described) > 6:
+        return ""
+    return "\n\n" + "\n".join(f"- _{c}_: {d}" for c, d in described)
+
+
+def render_sql_result(raw_result, args):
+    """Turn execute_sql_query output into markdown without a model call."""
+    args = args or {}
+    if isinstance(raw_result, str):
+        if raw_result.lower().startswith("please upload"):
+            return UPLOAD_FIRST
+        # Any other string is a QueryError from compiling the model's arguments.
+        return f"⚠️ I couldn't look that up in the uploaded data. {raw_result} Please try rephrasing the question."
+    if not isinstance(raw_result, list):
+        return None
+    if getattr(raw_result, "error", None):
+        return QUERY_FAILED
+    if not raw_result:
+        return "No matching records were found for this query."
+
+    where = args.get("whereClause") or args.get("where_clause")
+    descriptions = _descriptions(args.get("table_name"))
+    columns = list(raw_result[0].keys())
+
+    if len(raw_result) == 1 and len(columns) == 1:
+        column = columns[0]
+        parts = _aggregate_parts(column)
+        if parts is None:
+            subject = f"**{column}**"
+        else:
+            word, target = parts
+            subject = f"{word} **{target}**" if word else f"**{target}**"
+        return f"The {subject}{_filter_text(where)} is **{format_value(raw_result[0][column])}**."
+
+    if len(raw_result) == 1:
+        row = raw_result[0]
+        heading = f"Here are the details{_filter_text(where)}:"
+        lines = [f"- **{column_label(c)}**: {format_value(row[c])}" for c in columns]
+        return heading + "\n\n" + "\n".join(lines)
+
+    count = len(raw_result)
+    if getattr(raw_result, "truncated", False):
+        heading = f"Showing the first **{count}** matching records{_filter_text(where)} (more are available):"
+    else:
+        heading = f"Found **{count}** matching record{'s' if count != 1 else ''}{_filter_text(where)}:"
+    return heading + "\n\n" + markdown_table(raw_result) + _legend(columns, descriptions)
+
+
+def render_result(function_name, raw_result, args=None):
+    """Render results locally when no model is needed; None means 'use the LLM formatter'."""
+    if function_name == "get_order_details":
+        return render_sql_result(raw_result, args)
+    if function_name == "handle_unknown_query" and isinstance(raw_result, str):
+        return raw_result
+    if isinstance(raw_result, str) and raw_result.lower().startswith("please upload"):
+        return UPLOAD_FIRST
+    if isinstance(raw_result, dict) and set(raw_result) == {"message"}:
+        return raw_result["message"]
+    return None
@@ -1,13 +1,10 @@
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
-from backend.functions import functions_prompt, tool_defs 
+from backend.prompts import FORMAT_INSTRUCTIONS, PromptModel
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
-model = genai.GenerativeModel(
-    model_name="gemini-2.5-flash",
-    system_instruction=functions_prompt,
-    tools=[{"function_declarations": tool_defs}]
-)
+# Answer formatting needs neither the routing rules nor the tool declarations, only its own instructions.
+model = PromptModel("format", FORMAT_INSTRUCTIONS)
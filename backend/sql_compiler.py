@@ -0,0 +1,498 @@
+import re
+import threading
+
+from backend import catalog, dates, db_pool
+
+AGGREGATE_FUNCTIONS = ("COUNT", "SUM", "AVG", "MIN", "MAX")
+# strftime formats accepted in group_by; anything else is rejected rather than inlined.
+DATE_BUCKETS = {"%Y": "year", "%Y-%m": "month", "%m": "month of year", "%Y-%m-%d": "day", "%m-%d": "month day"}
+
+_AGG_RE = re.compile(r'^\s*(COUNT|SUM|AVG|MIN|MAX)\s*\(\s*(.+?)\s*\)\s*$', re.IGNORECASE)
+_STRFTIME_RE = re.compile(r"""^\s*strftime\(\s*'([^']+)'\s*,\s*(.+?)\s*\)\s*$""", re.IGNORECASE)
+_FUNC_RE = re.compile(r"""^\s*(year|month|day|date)\(\s*(.+?)\s*\)\s*$""", re.IGNORECASE)
+_FUNC_FORMATS = {"year": "%Y", "month": "%Y-%m", "day": "%Y-%m-%d", "date": "%Y-%m-%d"}
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+# strftime formats accepted on the left of a filter, e.g. strftime('%m-%d', "Sale Date") = '07-04'.
+FILTER_FORMATS = set(DATE_BUCKETS) | {"%d"}
+_VALUE = r"'(?:[^']|'')*'|-?\d+(?:\.\d+)?"
+_CONDITION_RE = re.compile(
+    rf"""\s*(?:
+        (?P<date>DATE)\s*\(\s*(?P<date_col>"[^"]+"|[\w\x20]+?)\s*\)
+      | strftime\s*\(\s*'(?P<fmt>[^']+)'\s*,\s*(?P<fmt_col>"[^"]+"|[\w\x20]+?)\s*\)
+      | (?P<col>"[^"]+"|[\w\x20]+?)
+    )\s*(?:
+        BETWEEN\s*(?P<low>{_VALUE})\s+AND\s*(?P<high>{_VALUE})
+      | (?P<in>(?:\bNOT\s+)?\bIN)\s*\(\s*(?P<items>(?:{_VALUE})(?:\s*,\s*(?:{_VALUE}))*)\s*\)
+      | (?P<op>=|!=|<>|>=|<=|>|<|\bLIKE\b)\s*(?P<value>{_VALUE})
+    )(?:\s+COLLATE\s+NOCASE)?\s*""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_VALUE_RE = re.compile(_VALUE)
+_AND_RE = re.compile(r"AND\b\s*", re.IGNORECASE)
+_OR_RE = re.compile(r"OR\b\s*", re.IGNORECASE)
+_OPEN_RE = re.compile(r"\s*\(\s*")
+_CLOSE_RE = re.compile(r"\)\s*")
+# LIKE patterns the model emits for date columns (see prompts.DECISION_RULES).
+_LIKE_DAY_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})%?$")
+_LIKE_MONTH_RE = re.compile(r"^(\d{4})-(\d{2})-?%$")
+_LIKE_YEAR_RE = re.compile(r"^(\d{4})-?%$")
+_LIKE_MONTH_DAY_RE = re.compile(r"^%-(\d{2})-(\d{2})%?$")
+_LIKE_MONTH_ONLY_RE = re.compile(r"^%-(\d{2})-%$")
+
+_columns_cache = {}
+_columns_lock = threading.Lock()
+
+
+class QueryError(ValueError):
+    """The model's arguments reference something that does not exist or cannot be compiled safely."""
+
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def unquote_identifier(name):
+    """The bare name from a possibly quoted identifier; quotes inside the name are kept."""
+    name = str(name).strip()
+    if len(name) >= 2 and name[0] == name[-1] and name[0] in "\"'`":
+        name = name[1:-1].replace(name[0] * 2, name[0])
+    return name.strip()
+
+
+class Predicate:
+    """One bound comparison: [func(]column[)] op ?.
+
+    op is '=', '!=', '<', '<=', '>', '>=', 'LIKE', or 'IN' / 'NOT IN' with a list value;
+    func is None, "date" for DATE(column), or a strftime format from FILTER_FORMATS.
+    """
+
+    __slots__ = ("column", "op", "value", "func")
+
+    def __init__(self, column, op, value, func=None):
+        self.column = column
+        self.op = op
+        self.value = value
+        self.func = func
+
+    def __repr__(self):
+        func = f", func={self.func!r}" if self.func else ""
+        return f"Predicate({self.column!r}, {self.op!r}, {self.value!r}{func})"
+
+
+class AnyOf:
+    """A bound disjunction: at least one group (a list of AND-ed predicates) must hold."""
+
+    __slots__ = ("groups",)
+
+    def __init__(self, groups):
+        self.groups = groups
+
+    def __repr__(self):
+        return f"AnyOf({self.groups!r})"
+
+
+def predicate_columns(predicates):
+    """Column names referenced by parsed predicates, including those inside AnyOf groups."""
+    columns = []
+    for predicate in predicates:
+        if isinstance(predicate, AnyOf):
+            columns.extend(predicate_columns([p for group in predicate.groups for p in group]))
+        else:
+            columns.append(predicate.column)
+    return columns
+
+
+def _valid(month, day=1):
+    """Whether a parsed month (and day) can be a calendar date; anything else keeps the raw filter."""
+    return 1 <= int(month) <= 12 and 1 <= int(day) <= 31
+
+
+def _literal(text):
+    return text[1:-1].replace("''", "'") if text.startswith("'") else text
+
+
+def _condition(match):
+    """Predicates for one matched comparison; BETWEEN becomes a >= / <= pair."""
+    if match.group("date"):
+        column, func = match.group("date_col"), "date"
+    elif match.group("fmt"):
+        column, func = match.group("fmt_col"), match.group("fmt")
+    else:
+        column, func = match.group("col"), None
+    column = unquote_identifier(column)
+    if match.group("in"):
+        op = "NOT IN" if match.group("in").upper().startswith("NOT") else "IN"
+        return [Predicate(column, op, [_literal(v) for v in _VALUE_RE.findall(match.group("items"))], func)]
+    if match.group("op"):
+        op = match.group("op").upper()
+        value = _literal(match.group("value"))
+        if op == "=" and func is None and ("%" in value or "_" in value):
+            op = "LIKE"
+        return [Predicate(column, "!=" if op == "<>" else op, value, func)]
+    return [
+        Predicate(column, ">=", _literal(match.group("low")), func),
+        Predicate(column, "<=", _literal(match.group("high")), func),
+    ]
+
+
+def _parse_conditions(where):
+    """Predicates from a filter string of comparisons, BETWEEN and IN joined by AND / OR.
+
+    The result is AND-ed at the top level; OR-ed terms (and parenthesised groups containing
+    OR) become a single AnyOf, so every value is still bound rather than inlined.
+    """
+    pos = 0
+
+    def fail():
+        raise QueryError(f"Unsupported filter: {where[pos:]!r}")
+
+    def as_predicates(groups):
+        return groups[0] if len(groups) == 1 else [AnyOf(groups)]
+
+    def disjunction():
+        nonlocal pos
+        groups = [conjunction()]
+        joiner = _OR_RE.match(where, pos)
+        while joiner:
+            pos = joiner.end()
+            groups.append(conjunction())
+            joiner = _OR_RE.match(where, pos)
+        return groups
+
+    def conjunction():
+        nonlocal pos
+        predicates = term()
+        joiner = _AND_RE.match(where, pos)
+        while joiner:
+            pos = joiner.end()
+            predicates += term()
+            joiner = _AND_RE.match(where, pos)
+        return predicates
+
+    def term():
+        nonlocal pos
+        opened = _OPEN_RE.match(where, pos)
+        if opened:
+            pos = opened.end()
+            groups = disjunction()
+            closed = _CLOSE_RE.match(where, pos)
+            if not closed:
+                fail()
+            pos = closed.end()
+            return as_predicates(groups)
+        match = _CONDITION_RE.match(where, pos)
+        if not match or match.end() == pos:
+            fail()
+        pos = match.end()
+        return _condition(match)
+
+    predicates = as_predicates(disjunction())
+    if pos != len(where):
+        fail()
+    return predicates
+
+
+def parse_where(where):
+    """Structured predicates from the model's whereClause (a dict, or an 'a = 'x' AND (b IN (...) OR ...)' string)."""
+    if not where:
+        return []
+    if isinstance(where, list):
+        return list(where)
+    if isinstance(where, dict):
+        predicates = []
+        for column, value in where.items():
+            value = str(value).strip()
+            if _ISO_DATE_RE.match(value):
+                predicates.append(Predicate(column, "=", value, "date"))
+            elif "%" in value or "_" in value:
+                predicates.append(Predicate(column, "LIKE", value))
+            else:
+                predicates.append(Predicate(column, "=", value))
+        return predicates
+    if isinstance(where, str):
+        return _parse_conditions(where.strip())
+    raise QueryError(f"Unsupported whereClause type: {type(where).__name__}")
+
+
+def date_condition(predicate):
+    """Normalize a filter on a date column to day-granularity terms, or None if it has no such form.
+
+    Returns ("date", op, iso) for DATE(col) or an ISO date on the bare column, ("period", op,
+    start, end) for year/month strftime filters and LIKE prefixes ([start, end) as ISO dates),
+    ("month_day", op, month, day) with op "=" or "!=", or ("month" | "day", op, number).
+    Both the SQL compiler (derived columns) and the columnar engine (day numbers) apply these.
+    """
+    op, value, func = predicate.op, str(predicate.value).strip(), predicate.func
+    if op == "LIKE":
+        if func:
+            return None
+        match = _LIKE_DAY_RE.match(value)
+        if match:
+            year, month, dd = match.groups()
+            return ("date", "=", f"{year}-{month}-{dd}") if _valid(month, dd) else None
+        month_day = _LIKE_MONTH_DAY_RE.match(value)
+        if month_day:
+            month, dd = month_day.groups()
+            return ("month_day", "=", int(month), int(dd)) if _valid(month, dd) else None
+        month_only = _LIKE_MONTH_ONLY_RE.match(value)
+        if month_only:
+            month = month_only.group(1)
+            return ("month", "=", int(month)) if _valid(month) else None
+        match = _LIKE_MONTH_RE.match(value)
+        if match:
+            func, value, op = "%Y-%m", "-".join(match.groups()), "="
+        elif _LIKE_YEAR_RE.match(value):
+            func, value, op = "%Y", value[:4], "="
+        else:
+            return None
+    if func in (None, "date", "%Y-%m-%d"):
+        if not (_ISO_DATE_RE.match(value) and _valid(value[5:7], value[8:10])):
+            return None
+        return "date", op, value
+    if func == "%Y-%m" and re.fullmatch(r"\d{4}-\d{2}", value) and _valid(value[5:]):
+        following = dates.next_month(int(value[:4]), int(value[5:]))
+        return "period", op, f"{value}-01", "%04d-%02d-01" % following
+    if func == "%Y" and re.fullmatch(r"\d{4}", value):
+        return "period", op, f"{value}-01-01", f"{int(value) + 1:04d}-01-01"
+    if func == "%m-%d" and op in ("=", "!=") and re.fullmatch(r"\d{2}-\d{2}", value) \
+            and _valid(value[:2], value[3:]):
+        return "month_day", op, int(value[:2]), int(value[3:])
+    if func == "%m" and re.fullmatch(r"\d{2}", value) and _valid(value):
+        return "month", op, int(value)
+    if func == "%d" and re.fullmatch(r"\d{2}", value) and _valid(1, value):
+        return "day", op, int(value)
+    return None
+
+
+def table_columns(table_name, db_name=db_pool.DB_NAME):
+    """{lower-cased name: (actual name, declared type)} for a table; cached until the catalog changes."""
+    key = (db_name, table_name.lower())
+    with _columns_lock:
+        cached = _columns_cache.get(key)
+        if cached and cached[0] == catalog.version:
+            return cached[1]
+    with db_pool.connection(db_name) as conn:
+        info = conn.execute(f"PRAGMA table_info({quote_identifier(table_name)})").fetchall()
+    if not info:
+        raise QueryError(f"Table '{table_name}' does not exist.")
+    columns = {row[1].lower(): (row[1], (row[2] or "").upper()) for row in info}
+    with _columns_lock:
+        _columns_cache[key] = (catalog.version, columns)
+    return columns
+
+
+class SelectQuery:
+    """A validated SELECT over one table; compile() returns plan-stable SQL text plus bound parameters."""
+
+    def __init__(self, table_name, db_name=db_pool.DB_NAME):
+        self.table = table_name
+        self.columns = table_columns(table_name, db_name)
+        self.select = []  # SQL expressions, already built from validated identifiers
+        self.where = []  # (sql fragment, params)
+        self.group_by = []
+        self.distinct = False
+
+    def resolve(self, name):
+        name = unquote_identifier(name)
+        entry = self.columns.get(name.lower())
+        if entry is None:
+            raise QueryError(f"Column '{name}' does not exist in table '{self.table}'.")
+        return entry
+
+    def column(self, name):
+        actual, _ = self.resolve(name)
+        return quote_identifier(actual)
+
+    def _bucket(self, expression):
+        """(sql, label) for a strftime/year()/month() date bucket, or None for a plain column."""
+        match = _STRFTIME_RE.match(expression)
+        if match:
+            fmt, inner = match.group(1), match.group(2)
+        else:
+            match = _FUNC_RE.match(expression)
+            if not match:
+                return None
+            fmt, inner = _FUNC_FORMATS[match.group(1).lower()], match.group(2)
+        if fmt not in DATE_BUCKETS:
+            raise QueryError(f"Unsupported date bucket '{fmt}'.")
+        actual, _ = self.resolve(inner)
+        derived = self._derived(actual)
+        # The raw text may be DD/MM/YYYY, which strftime reads as NULL; "<col>__date" is always ISO.
+        source = derived["date"] if derived else quote_identifier(actual)
+        return f"strftime('{fmt}', {source})", f"{actual} ({DATE_BUCKETS[fmt]})"
+
+    def add_column(self, expression):
+        match = _AGG_RE.match(str(expression))
+        if match:
+            self.add_aggregate(match.group(1), match.group(2))
+            return
+        bucket = self._bucket(str(expression))
+        if bucket:
+            self.select.append(f"{bucket[0]} AS {quote_identifier(bucket[1])}")
+        else:
+            self.select.append(self.column(expression))
+
+    def add_aggregate(self, operation, column):
+        operation = str(operation).upper()
+        if operation not in AGGREGATE_FUNCTIONS:
+            raise QueryError(f"Unsupported aggregation '{operation}'.")
+        column = unquote_identifier(column or "*")
+        if column == "*":
+            if operation != "COUNT":
+                raise QueryError(f"{operation}(*) is not valid.")
+            self.select.append("COUNT(*)")
+            return
+        actual, _ = self.resolve(column)
+        # Keep the SQLite-style header (e.g. SUM("Total Price")) the renderer and columnar engine use.
+        expression = f"{operation}({quote_identifier(actual)})"
+        self.select.append(f"{expression} AS {quote_identifier(expression)}")
+
+    def add_group(self, expression, select=True):
+        bucket = self._bucket(str(expression))
+        if bucket:
+            sql, label = bucket
+            if select:
+                self.select.append(f"{sql} AS {quote_identifier(label)}")
+            self.group_by.append(sql)
+        else:
+            column = self.column(expression)
+            if select:
+                self.select.append(column)
+            self.group_by.append(column)
+
+    def _derived(self, actual):
+        """Quoted derived date columns for a column that has them (see dates.py), else None."""
+        names = dates.derived_columns(actual)
+        if names[0].lower() not in self.columns:
+            return None
+        return dict(zip(("date", "year", "month", "day"), (quote_identifier(n) for n in names)))
+
+    def _date_predicate(self, derived, predicate):
+        """Rewrite a date filter onto the indexed derived columns; None if it has no such form."""
+        condition = date_condition(predicate)
+        if condition is None:
+            return None
+        kind, op, *values = condition
+        if kind == "date":
+            return f"{derived['date']} {op} ?", values
+        if kind == "period":
+            column, (start, end) = derived["date"], values
+            if op == "=":
+                return f"{column} >= ? AND {column} < ?", [start, end]
+            if op == "!=":
+                return f"({column} < ? OR {column} >= ?)", [start, end]
+            return {
+                "<": (f"{column} < ?", [start]), "<=": (f"{column} < ?", [end]),
+                ">": (f"{column} >= ?", [end]), ">=": (f"{column} >= ?", [start]),
+            }[op]
+        if kind == "month_day":
+            day = f"{derived['month']} = ? AND {derived['day']} = ?"
+            return (day, values) if op == "=" else (f"NOT ({day})", values)
+        return f"{derived[kind]} {op} ?", values
+
+    def add_predicate(self, predicate):
+        self.where.append(self._condition_sql(predicate))
+
+    def _any_of_sql(self, any_of):
+        fragments, params = [], []
+        for group in any_of.groups:
+            parts = [self._condition_sql(p) for p in group]
+            fragments.append("(" + " AND ".join(fragment for fragment, _ in parts) + ")")
+            for _, values in parts:
+                params.extend(values)
+        return "(" + " OR ".join(fragments) + ")", params
+
+    def _in_sql(self, predicate, column, declared, derived):
+        values = list(predicate.value)
+        if not values:
+            raise QueryError(f"Empty {predicate.op} list for '{predicate.column}'.")
+        placeholders = ", ".join("?" for _ in values)
+        if derived and not predicate.func:
+            days = [date_condition(Predicate(predicate.column, "=", v)) for v in values]
+            if all(day and day[0] == "date" for day in days):
+                return f"{derived['date']} {predicate.op} ({placeholders})", [day[2] for day in days]
+        if predicate.func:
+            raise QueryError(f"{predicate.op} is not supported on date functions.")
+        if declared in ("INTEGER", "REAL"):
+            return f"{column} {predicate.op} ({placeholders})", [self._number(v) for v in values]
+        return f"{column} COLLATE NOCASE {predicate.op} ({placeholders})", values
+
+    @staticmethod
+    def _number(value):
+        try:
+            return int(value) if re.fullmatch(r"-?\d+", str(value)) else float(value)
+        except (TypeError, ValueError):
+            return value
+
+    def _condition_sql(self, predicate):
+        """(sql fragment, params) for one parsed predicate or AnyOf."""
+        if isinstance(predicate, AnyOf):
+            return self._any_of_sql(predicate)
+        actual, declared = self.resolve(predicate.column)
+        column = quote_identifier(actual)
+        value = predicate.value
+        if predicate.op not in ("=", "!=", "<", "<=", ">", ">=", "LIKE", "IN", "NOT IN"):
+            raise QueryError(f"Unsupported operator '{predicate.op}'.")
+        derived = self._derived(actual)
+        if predicate.op in ("IN", "NOT IN"):
+            return self._in_sql(predicate, column, declared, derived)
+        if derived:
+            rewritten = self._date_predicate(derived, predicate)
+            if rewritten:
+                return rewritten
+        if predicate.func:
+            # No derived columns (or an unusual shape): compare through the function, unindexed.
+            source = derived["date"] if derived else column
+            if predicate.func == "date":
+                expression = f"DATE({source})"
+            elif predicate.func in FILTER_FORMATS:
+                expression = f"strftime('{predicate.func}', {source})"
+            else:
+                raise QueryError(f"Unsupported date format '{predicate.func}'.")
+            return f"{expression} {predicate.op} ?", [value]
+        numeric = declared in ("INTEGER", "REAL")
+        if numeric and predicate.op != "LIKE":
+            value = self._number(value)
+        if predicate.op == "LIKE":
+            return f"{column} LIKE ?", [value]
+        # NOCASE on text equality matches the load-time NOCASE indexes; numbers compare as numbers.
+        collate = "" if numeric or predicate.op not in ("=", "!=") else " COLLATE NOCASE"
+        return f"{column} {predicate.op} ?{collate}", [value]
+
+    def compile(self, limit=None, offset=0):
+        # "*" would also return the hidden derived date columns, so spell out the visible ones.
+        select = self.select or [quote_identifier(a) for a, _ in self.columns.values() if not dates.is_derived(a)]
+        sql = "SELECT " + ("DISTINCT " if self.distinct else "") + ", ".join(select)
+        sql += f" FROM {quote_identifier(self.table)}"
+        params = []
+        if self.where:
+            sql += " WHERE " + " AND ".join(fragment for fragment, _ in self.where)
+            for _, values in self.where:
+                params.extend(values)
+        if self.group_by:
+            sql += " GROUP BY " + ", ".join(self.group_by)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([int(limit), int(offset or 0)])
+        return sql, params
+
+
+def build_select(table_name, columns=None, where=None, aggregations=None, group_by=None, distinct=False,
+                 db_name=db_pool.DB_NAME):
+    """Validate the model's get_order_details arguments against the table and build a SelectQuery."""
+    query = SelectQuery(table_name, db_name)
+    query.distinct = bool(distinct)
+    if aggregations:
+        # Group keys come first so grouped results say which group each aggregate belongs to.
+        for expression in group_by or []:
+            query.add_group(expression)
+        for agg in aggregations:
+            query.add_aggregate(agg.get("operation"), agg.get("column"))
+    else:
+        for expression in columns or []:
+            query.add_column(expression)
+        for expression in group_by or []:
+            query.add_group(expression, select=False)
+    for predicate in parse_where(where):
+        query.add_predicate(predicate)
+    return query
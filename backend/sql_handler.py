@@ -4,19 +4,63 @@ import logging
 import csv
 import os
 import re
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+from backend import db_pool
+from backend.ingest import load_csv
+from backend.sql_compiler import QueryError, build_select
 
 last_uploaded_table = None
 last_uploaded_file_type = None 
 
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "500"))
+SQL_FETCH_BATCH = int(os.getenv("SQL_FETCH_BATCH", "256"))
+_PAGE_TOKEN_SECRET = os.getenv("PAGE_TOKEN_SECRET", secrets.token_hex(16)).encode()
+
+
+class ResultPage(list):
+    """List of row dicts plus paging info; serialises like a plain list.
+
+    A failed query comes back empty with `error` set, so it is not mistaken for "no matches".
+    """
+
+    def __init__(self, rows=(), truncated=False, offset=0, error=None):
+        super().__init__(rows)
+        self.truncated = truncated
+        self.offset = offset
+        self.error = error
+
+    @property
+    def next_offset(self):
+        return self.offset + len(self) if self.truncated else None
+
+
+def make_page_token(args, offset):
+    """Opaque, signed cursor for fetching the next page of a get_order_details call."""
+    payload = json.dumps({"args": args, "offset": offset}, sort_keys=True, default=str).encode()
+    sig = hmac.new(_PAGE_TOKEN_SECRET, payload, hashlib.sha256).hexdigest()[:32]
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=") + "." + sig
+
+
+def read_page_token(token):
+    """Return (args, offset) from a page token, or raise ValueError if it was tampered with."""
+    try:
+        body, sig = token.rsplit(".", 1)
+        payload = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+    except Exception:
+        raise ValueError("Malformed page token.")
+    expected = hmac.new(_PAGE_TOKEN_SECRET, payload, hashlib.sha256).hexdigest()[:32]
+    if not hmac.compare_digest(sig, expected):
+        raise ValueError("Invalid or expired page token.")
+    data = json.loads(payload)
+    return data["args"], int(data["offset"])
+
 def load_csv_to_sqlite(filepath, table_name, db_name="data.db"):
     global last_uploaded_table, last_uploaded_file_type
-    try:
-        df = pd.read_csv(filepath, encoding="utf-8")
-    except UnicodeDecodeError:
-        print("UTF-8 failed, trying ISO-8859-1...")
-        df = pd.read_csv(filepath, encoding="ISO-8859-1")
-    with sqlite3.connect(db_name) as conn:
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
+    load_csv(filepath, table_name, db_name)
     last_uploaded_table = table_name
     last_uploaded_file_type = "csv" 
 
@@ -35,14 +79,18 @@ def set_last_file_type(ftype: str):
     last_uploaded_file_type = ftype 
 
 def list_tables(db_name="data.db"):
-    with sqlite3.connect(db_name) as conn:
+    with db_pool.connection(db_name) as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        # Internal tables (the schema catalog, ANALYZE statistics) are not user data; uploaded names never start with "_".
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' "
+            "AND name NOT LIKE '\\_%' ESCAPE '\\' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\';"
+        )
         tables = cursor.fetchall()
     return [t[0] for t in tables]
 
 def ask_sql_question(query: str, table_name: str, db_name="data.db") -> str:
-    with sqlite3.connect(db_name) as conn:
+    with db_pool.connection(db_name) as conn:
         cursor = conn.cursor()
         try:
             cursor.execute(query)
@@ -72,48 +120,45 @@ def quote_column(col):
         return col
 
 
-def get_selected_columns(table_name, columns=None, where_clause=None, aggregations=None, group_by=None, distinct=False):
-    logging.info("get selected column is called")
-    conn = sqlite3.connect("data.db")
-    cursor = conn.cursor()
-
-    if columns is None:
-        columns = []
-    if aggregations is None:
-        aggregations = []
-    if group_by is None:
-        group_by = []
-    select_parts = []
-
-    if distinct:
-        select_parts.append("DISTINCT")
+def get_selected_columns(table_name, columns=None, where_clause=None, aggregations=None, group_by=None, distinct=False,
+                         limit=None, offset=0, db_name="data.db"):
+    """Compile the structured arguments into a parameterized SELECT and run it.
 
-    if aggregations:
-        for agg in aggregations:
-            select_parts.append(f'{agg["operation"]}("{agg["column"]}")')
-    else:
-        for col in columns:
-            select_parts.append(quote_column(col))
+    where_clause may be a dict, a list of sql_compiler.Predicate / AnyOf or a filter
+    string of comparisons, BETWEEN and IN joined by AND / OR; values are always bound, never inlined, so
+    repeated lookups share one statement in the connection's statement cache.
+    """
+    logging.info("get selected column is called")
 
-    if not select_parts:
-        select_parts.append("*") 
+    if not os.path.exists(db_name):
+        return "Please upload a file first."
+    try:
+        select = build_select(table_name, columns, where_clause, aggregations, group_by, distinct, db_name=db_name)
+    except QueryError as e:
+        logging.warning(f"Rejected query on '{table_name}': {e}")
+        return str(e)
 
-    select_clause = ", ".join(select_parts)
-    quoted_table = f'"{table_name}"'
-    query = f"SELECT {select_clause} FROM {quoted_table}"
+    max_rows = min(int(limit), SQL_MAX_ROWS) if limit else SQL_MAX_ROWS
+    offset = max(int(offset or 0), 0)
+    # One extra row tells us whether there is another page.
+    query, params = select.compile(limit=max_rows + 1, offset=offset)
 
-    if where_clause:
-        query += f" WHERE {where_clause} COLLATE NOCASE"
+    logging.debug(f"Final SQL query: {query} {params}")
+    return execute_sql_query(query, db_name=db_name, max_rows=max_rows, offset=offset, params=params)
 
-    if group_by:
-        group_sql = ", ".join([f'"{col}"' for col in group_by])
-        query += f" GROUP BY {group_sql}"
 
-    print("🧠 Final SQL Query -->", query)
-    return execute_sql_query(query)
+def iter_query_rows(cursor, max_rows):
+    """Yield up to max_rows rows using fetchmany so large results are never fully materialised."""
+    remaining = max_rows
+    while remaining > 0:
+        batch = cursor.fetchmany(min(SQL_FETCH_BATCH, remaining))
+        if not batch:
+            return
+        remaining -= len(batch)
+        yield from batch
 
 
-def execute_sql_query(query: str, db_name="data.db"):
+def execute_sql_query(query: str, db_name="data.db", max_rows=None, offset=0, params=()):
     logging.info("Execute sql query is executed")    
     try:
         logging.info(f"This is the input of execute_sql_query:{query}")
@@ -121,19 +166,21 @@ def execute_sql_query(query: str, db_name="data.db"):
         if not os.path.exists(db_name):
             return "Please upload a file first."
 
-        with sqlite3.connect(db_name) as conn:
+        max_rows = max_rows or SQL_MAX_ROWS
+        with db_pool.connection(db_name) as conn:
             cursor = conn.cursor()
-            cursor.execute(query)
-            rows = cursor.fetchall()
+            cursor.execute(query, params)
             headers = [desc[0] for desc in cursor.description] if cursor.description else []
-        result =  [dict(zip(headers, row)) for row in rows] if headers else []
-        logging.info(f"this is the raw result after execution:{result}")
+            rows = [dict(zip(headers, row)) for row in iter_query_rows(cursor, max_rows + 1)] if headers else []
+            cursor.close()
+        truncated = len(rows) > max_rows
+        result = ResultPage(rows[:max_rows], truncated=truncated, offset=offset)
+        logging.info(f"SQL returned {len(result)} rows (offset {offset}, truncated={truncated})")
 
-            
         return result
     except Exception as e:
-        print(f"SQL Execution Error: {e}")
-        return []
+        logging.error(f"SQL Execution Error: {e}")
+        return ResultPage(offset=offset, error=str(e))
 
 
 
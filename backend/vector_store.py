@@ -0,0 +1,361 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant").lower()
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "vector_store")
+# Rewrite the local store without its deleted rows once this share of rows is dead.
+LOCAL_VECTOR_COMPACT_RATIO = float(os.getenv("LOCAL_VECTOR_COMPACT_RATIO", "0.3"))
+_INITIAL_CAPACITY = 1024
+_COMPACT_BATCH = 65536
+
+
+class SearchHit:
+    """Backend-neutral search result, shaped like Qdrant's ScoredPoint (id, score, payload)."""
+
+    __slots__ = ("id", "score", "payload")
+
+    def __init__(self, id, score, payload):
+        self.id = id
+        self.score = score
+        self.payload = payload
+
+
+class QdrantStore:
+    """Vector store backed by the remote Qdrant collection."""
+
+    def __init__(self, client, collection_name="documents"):
+        self.client = client
+        self.collection_name = collection_name
+
+    def ensure(self, dim):
+        from backend.embedding import ensure_collection_exists
+        ensure_collection_exists(vector_size=dim, collection_name=self.collection_name)
+
+    def upsert(self, ids, vectors, payloads):
+        from qdrant_client.models import PointStruct
+        points = [PointStruct(id=i, vector=v, payload=p) for i, v, p in zip(ids, vectors, payloads)]
+        self.client.upsert(collection_name=self.collection_name, points=points)
+
+    def search(self, vector, limit=5, file_name=None):
+        query_filter = _file_filter(file_name) if file_name else None
+        hits = self.client.search(self.collection_name, query_vector=vector, limit=limit, query_filter=query_filter)
+        return [SearchHit(h.id, h.score, h.payload or {}) for h in hits]
+
+    def has_file(self, file_name):
+        points, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=_file_filter(file_name),
+            limit=1,
+            with_payload=False,
+            with_vectors=False,
+        )
+        return bool(points)
+
+    def has_ids(self, ids):
+        """True if every given point ID is stored (a missing collection counts as empty)."""
+        if not any(c.name == self.collection_name for c in self.client.get_collections().collections):
+            return False
+        found = self.client.retrieve(self.collection_name, ids=list(ids), with_payload=False, with_vectors=False)
+        return len(found) == len(set(ids))
+
+    def delete_ids(self, ids):
+        from qdrant_client.models import PointIdsList
+        if ids:
+            self.client.delete(collection_name=self.collection_name, points_selector=PointIdsList(points=list(ids)))
+
+    def delete_file(self, file_name):
+        from qdrant_client.models import FilterSelector
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=_file_filter(file_name)),
+        )
+
+    def reset(self):
+        self.client.delete_collection(self.collection_name)
+
+
+def _file_filter(file_name):
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+    return Filter(must=[FieldCondition(key="file_name", match=MatchValue(value=file_name))])
+
+
+class LocalVectorStore:
+    """In-process cosine index: normalized float32 rows in a memory-mapped file.
+
+    Layout under <root>/<collection>/:
+      vectors.f32  - (capacity, dim) float32 matrix, one normalized vector per row
+      meta.json    - dim, capacity and generation
+      points.jsonl - append-only log of {"op": "add"|"del", ...} replayed on load
+    Deletes are tombstones; search masks them out. Once LOCAL_VECTOR_COMPACT_RATIO of
+    the rows are dead, the live rows are rewritten into vectors.<n>.f32/points.<n>.jsonl
+    and meta.json is switched to generation n in one atomic replace.
+    """
+
+    def __init__(self, root=LOCAL_VECTOR_DIR, collection_name="documents"):
+        self.collection_name = collection_name
+        self.dir = os.path.join(root, collection_name)
+        self._lock = threading.RLock()
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def _vectors_file(self, generation=None):
+        generation = self.generation if generation is None else generation
+        return f"vectors.{generation}.f32" if generation else "vectors.f32"
+
+    def _log_file(self, generation=None):
+        generation = self.generation if generation is None else generation
+        return f"points.{generation}.jsonl" if generation else "points.jsonl"
+
+    def _load(self):
+        self.dim = None
+        self.capacity = 0
+        self.generation = 0
+        self.count = 0
+        self.ids = []
+        self.payloads = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of = {}
+        self.file_rows = {}
+        self.vectors = None
+
+        if not os.path.exists(self._path("meta.json")):
+            return
+        with open(self._path("meta.json")) as f:
+            meta = json.load(f)
+        self.dim, self.capacity = meta["dim"], meta["capacity"]
+        self.generation = meta.get("generation", 0)
+        self.vectors = np.memmap(self._path(self._vectors_file()), dtype=np.float32, mode="r+",
+                                 shape=(self.capacity, self.dim))
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        if os.path.exists(self._path(self._log_file())):
+            with open(self._path(self._log_file()), encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+
+    def _write_meta(self):
+        tmp = self._path("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "capacity": self.capacity, "generation": self.generation}, f)
+        os.replace(tmp, self._path("meta.json"))
+
+    def _log(self, records):
+        with open(self._path(self._log_file()), "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def _apply(self, record):
+        if record["op"] == "add":
+            row = record["row"]
+            while len(self.ids) <= row:
+                self.ids.append(None)
+                self.payloads.append(None)
+            self.ids[row] = record["id"]
+            self.payloads[row] = record["payload"]
+            self.alive[row] = True
+            self.row_of[record["id"]] = row
+            self.file_rows.setdefault(record["payload"].get("file_name"), set()).add(row)
+            self.count = max(self.count, row + 1)
+        elif record["op"] == "del":
+            row = record["row"]
+            self.alive[row] = False
+            if self.ids[row] is not None:
+                self.row_of.pop(self.ids[row], None)
+            rows = self.file_rows.get((self.payloads[row] or {}).get("file_name"))
+            if rows:
+                rows.discard(row)
+
+    def _grow(self, needed):
+        capacity = max(_INITIAL_CAPACITY, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+        tmp = self._path(self._vectors_file() + ".tmp")
+        grown = np.memmap(tmp, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+        if self.vectors is not None and self.count:
+            grown[:self.count] = self.vectors[:self.count]
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp, self._path(self._vectors_file()))
+        self.capacity = capacity
+        self.vectors = np.memmap(self._path(self._vectors_file()), dtype=np.float32, mode="r+",
+                                 shape=(self.capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive[:capacity]
+        self.alive = alive
+        self._write_meta()
+
+    def _maybe_compact(self):
+        dead = self.count - int(self.alive[:self.count].sum())
+        if dead >= _INITIAL_CAPACITY and dead > LOCAL_VECTOR_COMPACT_RATIO * self.count:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the live rows densely as the next generation; the old files go once meta.json points past them."""
+        start = time.perf_counter()
+        rows = np.flatnonzero(self.alive[:self.count])
+        generation = self.generation + 1
+        capacity = _INITIAL_CAPACITY
+        while capacity < len(rows):
+            capacity *= 2
+        vectors = np.memmap(self._path(self._vectors_file(generation)), dtype=np.float32, mode="w+",
+                            shape=(capacity, self.dim))
+        for offset in range(0, len(rows), _COMPACT_BATCH):
+            batch = rows[offset:offset + _COMPACT_BATCH]
+            vectors[offset:offset + len(batch)] = self.vectors[batch]
+        vectors.flush()
+        del vectors
+        with open(self._path(self._log_file(generation)), "w", encoding="utf-8") as f:
+            for new_row, row in enumerate(rows):
+                record = {"op": "add", "row": new_row, "id": self.ids[row], "payload": self.payloads[row]}
+                f.write(json.dumps(record) + "\n")
+
+        old_files = [self._vectors_file(), self._log_file()]
+        dead = self.count - len(rows)
+        self.generation, self.capacity = generation, capacity
+        self._write_meta()
+        self.vectors = None
+        for name in old_files:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+        self._load()
+        logging.info(f"Compacted local vector store '{self.collection_name}': dropped {dead} dead rows, "
+                     f"{len(rows)} live, in {time.perf_counter() - start:.2f}s")
+
+    # -- public API ----------------------------------------------------------
+
+    def ensure(self, dim):
+        with self._lock:
+            if self.dim is not None and self.dim != dim:
+                logging.warning(f"Local vector store dim mismatch ({self.dim} != {dim}); recreating.")
+                self.reset()
+            if self.dim is None:
+                os.makedirs(self.dir, exist_ok=True)
+                self.dim = dim
+                self._grow(_INITIAL_CAPACITY)
+
+    def upsert(self, ids, vectors, payloads):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or not len(matrix):
+            return
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+        with self._lock:
+            self.ensure(matrix.shape[1])
+            self._grow(self.count + len(matrix))
+            records = []
+            for point_id in ids:
+                if point_id in self.row_of:
+                    records.append({"op": "del", "row": self.row_of[point_id]})
+            start = self.count
+            self.vectors[start:start + len(matrix)] = matrix
+            self.vectors.flush()
+            for offset, (point_id, payload) in enumerate(zip(ids, payloads)):
+                records.append({"op": "add", "row": start + offset, "id": str(point_id), "payload": payload})
+            self._log(records)
+            for record in records:
+                self._apply(record)
+            self._maybe_compact()
+
+    def _mask(self, file_name=None):
+        mask = self.alive[:self.count].copy()
+        if file_name is not None:
+            allowed = np.zeros(self.count, dtype=bool)
+            allowed[list(self.file_rows.get(file_name, ()))] = True
+            mask &= allowed
+        return mask
+
+    def search_batch(self, vectors, limit=5, file_name=None):
+        """Top-k for several queries at once with a single matrix multiply."""
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        with self._lock:
+            if not self.count or self.dim != queries.shape[1]:
+                return [[] for _ in queries]
+            mask = self._mask(file_name)
+            available = int(mask.sum())
+            if not available:
+                return [[] for _ in queries]
+            scores = queries @ np.asarray(self.vectors[:self.count]).T
+            scores[:, ~mask] = -np.inf
+            k = min(limit, available)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for qi, rows in enumerate(top):
+                rows = rows[np.argsort(-scores[qi, rows])]
+                results.append([SearchHit(self.ids[r], float(scores[qi, r]), self.payloads[r]) for r in rows])
+            return results
+
+    def search(self, vector, limit=5, file_name=None):
+        return self.search_batch([vector], limit=limit, file_name=file_name)[0]
+
+    def has_file(self, file_name):
+        with self._lock:
+            return bool(self.file_rows.get(file_name))
+
+    def has_ids(self, ids):
+        with self._lock:
+            return all(str(i) in self.row_of for i in ids)
+
+    def delete_ids(self, ids):
+        with self._lock:
+            rows = sorted(self.row_of[str(i)] for i in ids if str(i) in self.row_of)
+            if not rows:
+                return
+            records = [{"op": "del", "row": r} for r in rows]
+            self._log(records)
+            for record in records:
+                self._apply(record)
+            self._maybe_compact()
+
+    def delete_file(self, file_name):
+        with self._lock:
+            rows = sorted(self.file_rows.get(file_name, ()))
+            if not rows:
+                return
+            records = [{"op": "del", "row": r} for r in rows]
+            self._log(records)
+            for record in records:
+                self._apply(record)
+            self._maybe_compact()
+
+    def reset(self):
+        with self._lock:
+            self.vectors = None
+            shutil.rmtree(self.dir, ignore_errors=True)
+            self._load()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(collection_name="documents"):
+    """Vector store for a collection, chosen by the VECTOR_STORE setting ("qdrant" or "local")."""
+    with _stores_lock:
+        store = _stores.get(collection_name)
+        if store is None:
+            if VECTOR_STORE == "local":
+                store = LocalVectorStore(collection_name=collection_name)
+            else:
+                from backend.embedding import client
+                store = QdrantStore(client, collection_name)
+            _stores[collection_name] = store
+        return store
@@ -0,0 +1,111 @@
+"""Compare chunking strategies on a synthetic policy manual.
+
+Reports chunk count, embedding requests (at EMBED_BATCH_SIZE per request) and
+top-5 retrieval hit-rate using a local hashed bag-of-words embedder, so no
+network access is needed.
+
+Usage: python -m benchmarks.bench_chunking [--sections 300] [--batch 64]
+"""
+import argparse
+import math
+import random
+import re
+from collections import Counter
+
+import numpy as np
+
+from backend.chunking import chunk_pages
+
+TOPICS = ["returns", "refunds", "shipping", "warranty", "exchanges", "cancellations", "gift cards", "privacy"]
+PRODUCTS = ["wireless mouse", "laptop stand", "usb hub", "desk lamp", "monitor arm", "keyboard", "webcam", "headset"]
+FILLER = [
+    "This section applies to all customers in supported regions.",
+    "Exceptions may be granted at the discretion of customer support.",
+    "Please keep your order confirmation for reference.",
+    "Terms may be updated periodically without prior notice.",
+    "Contact support through the help centre for further assistance.",
+    "Items must be returned in their original packaging where possible.",
+]
+
+
+def build_corpus(sections, seed=0):
+    """Pages of policy text plus (question, fact) pairs with exactly one answer each."""
+    rng = random.Random(seed)
+    pages, page, questions = [], [], []
+    for i in range(sections):
+        topic = TOPICS[i % len(TOPICS)]
+        product = f"{PRODUCTS[i % len(PRODUCTS)]} model {i}"
+        days = rng.randint(7, 120)
+        fact = f"The {topic} window for the {product} is {days} days."
+        body = rng.sample(FILLER, 3) + [fact] + rng.sample(FILLER, 2)
+        page.append(f"{i + 1}. {topic.title()} for {product.title()}\n\n" + " ".join(body) + "\n")
+        questions.append((f"What is the {topic} window for the {product}?", fact))
+        if len(page) == 4:
+            pages.append("\n".join(page))
+            page = []
+    if page:
+        pages.append("\n".join(page))
+    return pages, questions
+
+
+class HashingEmbedder:
+    """Deterministic TF-IDF style vectors over hashed word unigrams and bigrams."""
+
+    def __init__(self, dim=4096):
+        self.dim = dim
+        self.idf = {}
+
+    def _terms(self, text):
+        words = re.findall(r"\w+", text.lower())
+        return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+    def fit(self, texts):
+        df = Counter(t for text in texts for t in set(self._terms(text)))
+        self.idf = {t: math.log((1 + len(texts)) / (1 + n)) + 1 for t, n in df.items()}
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term, tf in Counter(self._terms(text)).items():
+                out[row, hash(term) % self.dim] += tf * self.idf.get(term, 1.0)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1, norms)
+
+
+def _normalize(text):
+    """Lower-cased words only, so a chunker that drops punctuation (e.g. split('. ')) is not penalised."""
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def evaluate(name, chunks, questions, batch):
+    embedder = HashingEmbedder()
+    embedder.fit(chunks)
+    matrix = embedder.embed(chunks)
+    normalized = [_normalize(c) for c in chunks]
+    hits = 0
+    for question, fact in questions:
+        scores = matrix @ embedder.embed([question])[0]
+        top = np.argsort(-scores)[:5]
+        fact = _normalize(fact)
+        hits += any(fact in normalized[i] for i in top)
+    avg_len = sum(len(c) for c in chunks) / max(len(chunks), 1)
+    print(f"{name:<22} chunks={len(chunks):>6}  embed_requests={math.ceil(len(chunks) / batch):>5}  "
+          f"avg_chars={avg_len:>6.0f}  hit@5={hits / len(questions):.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    pages, questions = build_corpus(args.sections)
+    joined = " ".join(pages)
+
+    evaluate("split('. ')", [c for c in joined.split(". ") if c.strip()], questions, args.batch)
+    evaluate("500-char slices", [joined[i:i + 500] for i in range(0, len(joined), 500)], questions, args.batch)
+    evaluate("structure-aware", chunk_pages(pages), questions, args.batch)
+
+
+if __name__ == "__main__":
+    main()
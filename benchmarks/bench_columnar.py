@@ -0,0 +1,87 @@
+"""Compare SQLite GROUP BY against the columnar engine on a synthetic sales table.
+
+Builds the table through backend.ingest (so the catalog and the columnar copy are
+created exactly as on upload) in a temporary directory, then times each query
+on both engines and checks that they return the same totals.
+
+Usage: python -m benchmarks.bench_columnar [--rows 1000000] [--repeat 5]
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from backend import columnar, db_pool, ingest
+
+COLUMNS = ["Order ID", "Category", "Country", "Payment Method", "Quantity", "Total Price", "Sale Date"]
+CATEGORIES = ["Electronics", "Clothing", "Home", "Toys", "Books", "Sports", "Beauty", "Garden"]
+COUNTRIES = ["India", "USA", "UK", "Germany", "France", "Japan", "Brazil", "Canada", "Spain", "Italy"]
+PAYMENTS = ["Credit Card", "Cash", "PayPal", "UPI"]
+
+QUERIES = [
+    ("total by category", [{"operation": "SUM", "column": "Total Price"}], ["Category"], None,
+     'SELECT "Category", SUM("Total Price") FROM sales GROUP BY "Category"'),
+    ("total by category per month", [{"operation": "SUM", "column": "Total Price"}],
+     ["Category", "strftime('%Y-%m', \"Sale Date\")"], None,
+     'SELECT "Category", strftime(\'%Y-%m\', "Sale Date"), SUM("Total Price") FROM sales GROUP BY 1, 2'),
+    ("avg by country, card only", [{"operation": "AVG", "column": "Total Price"}], ["Country"],
+     {"Payment Method": "credit card"},
+     'SELECT "Country", AVG("Total Price") FROM sales WHERE "Payment Method" = \'credit card\' COLLATE NOCASE '
+     'GROUP BY "Country"'),
+    ("orders and max qty", [{"operation": "COUNT", "column": "Order ID"}, {"operation": "MAX", "column": "Quantity"}],
+     [], None, 'SELECT COUNT("Order ID"), MAX("Quantity") FROM sales'),
+]
+
+
+def rows(n, seed=0):
+    rng = random.Random(seed)
+    start = datetime.date(2023, 1, 1)
+    for i in range(n):
+        quantity = rng.randint(1, 10)
+        yield (
+            f"ORD{i}", rng.choice(CATEGORIES), rng.choice(COUNTRIES), rng.choice(PAYMENTS),
+            quantity, quantity * rng.randint(5, 500), (start + datetime.timedelta(days=rng.randrange(730))).isoformat(),
+        )
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_columnar_")
+    os.chdir(workdir)
+    start = time.perf_counter()
+    with db_pool.connection("data.db") as conn:
+        ingest.ingest_rows(conn, "sales", COLUMNS, rows(args.rows))
+    print(f"Loaded {args.rows} rows (SQLite + catalog + columnar copy) in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'query':<30} {'sqlite ms':>10} {'columnar ms':>12} {'speedup':>8}  match")
+    for label, aggregations, group_by, where, sql in QUERIES:
+        def run_sql():
+            with db_pool.connection("data.db") as conn:
+                return conn.execute(sql).fetchall()
+
+        sql_rows, sql_ms = timed(run_sql, args.repeat)
+        page, col_ms = timed(lambda: columnar.aggregate("sales", aggregations, group_by, where), args.repeat)
+        sql_total = round(sum(r[-1] or 0 for r in sql_rows), 2)
+        col_total = round(sum(list(r.values())[-1] or 0 for r in page), 2)
+        match = len(sql_rows) == len(page) and sql_total == col_total
+        print(f"{label:<30} {sql_ms:>10.1f} {col_ms:>12.1f} {sql_ms / col_ms:>7.1f}x  {match}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""End-to-end latency, throughput and memory of the FastAPI app with local fakes.
+
+Gemini (GenerativeModel, embed_content) and QdrantClient are replaced by
+deterministic in-process fakes with configurable latency, so the numbers
+measure our own code plus whatever provider latency you choose to simulate.
+For each scale the harness resets the app, uploads a synthetic sales CSV and
+a policy DOCX through /upload, then drives /query through an in-process ASGI
+client and reports:
+
+  * upload wall time per file (accept + background job),
+  * per-stage latency: cache, decide, dispatch, sql, retrieval, render, format (llm),
+  * request latency for cold (caches emptied before every request) and warm passes,
+  * throughput with and without the answer/aggregate caches at --concurrency,
+  * peak RSS after each phase (and the Python heap peak with --tracemalloc, which
+    also slows everything down, so compare timings only between runs without it).
+
+Everything runs in a temporary working directory (data.db, uploads/, app.log).
+
+Usage: python -m benchmarks.bench_e2e [--scales small,medium] [--llm-latency-ms 300]
+       [--embed-latency-ms 50] [--vector-latency-ms 5] [--repeat 3] [--concurrency 8]
+       [--requests 200] [--llm-format] [--tracemalloc]
+"""
+import argparse
+import asyncio
+import csv
+import functools
+import hashlib
+import logging
+import os
+import re
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.bench_chunking import build_corpus
+from benchmarks.bench_columnar import COLUMNS, rows
+
+SCALES = {
+    "small": {"rows": 10000, "sections": 40},
+    "medium": {"rows": 100000, "sections": 200},
+    "large": {"rows": 1000000, "sections": 1000},
+}
+EMBED_DIM = 3072
+
+# Simulated provider latency in seconds, set from the command line.
+LATENCY = {"llm": 0.0, "embed": 0.0, "vector": 0.0}
+# The app prints progress notes (e.g. "File ... indexed") to stdout; results go here so they stay readable.
+_report_stream = sys.stdout
+
+
+def report(*args):
+    print(*args, file=_report_stream, flush=True)
+
+
+# -- fakes -------------------------------------------------------------------
+
+
+def _tokens(text):
+    return re.findall(r"\w+", str(text).lower())
+
+
+def fake_embed_content(content, model=None, task_type=None, **kwargs):
+    """embed_content stand-in: hashed bag-of-words vectors, one per input text."""
+    time.sleep(LATENCY["embed"])
+    texts = [content] if isinstance(content, str) else list(content)
+    vectors = []
+    for text in texts:
+        vector = np.zeros(EMBED_DIM, dtype=np.float32)
+        for token in _tokens(text):
+            vector[int(hashlib.md5(token.encode()).hexdigest()[:8], 16) % EMBED_DIM] += 1.0
+        norm = np.linalg.norm(vector)
+        vectors.append((vector / norm if norm else vector).tolist())
+    return {"embedding": vectors[0] if isinstance(content, str) else vectors}
+
+
+class _Response:
+    """The parts of a GenerateContentResponse the app reads."""
+
+    def __init__(self, prompt_tokens, text=None, function_call=None):
+        part = SimpleNamespace(text=text or "", function_call=function_call)
+        self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[part]))]
+        self.text = text or ""
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens, cached_content_token_count=0,
+            candidates_token_count=len(self.text) // 4,
+        )
+
+
+class FakeGenerativeModel:
+    """GenerativeModel stand-in: scripted tool calls for the decision model, canned text otherwise."""
+
+    decisions = {}  # user query -> (function name, arguments)
+
+    def __init__(self, model_name=None, system_instruction=None, tools=None, **kwargs):
+        self.system_instruction = system_instruction or ""
+        self.tools = tools
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        prompt = str(prompt)
+        prompt_tokens = (len(self.system_instruction) + len(prompt)) // 4
+        if self.tools:
+            time.sleep(LATENCY["llm"])
+            query = prompt.rsplit("User query:", 1)[-1].strip()
+            name, args = self.decisions.get(query, ("handle_unknown_query", {"message": "Sorry, I can't help."}))
+            return _Response(prompt_tokens, function_call=SimpleNamespace(name=name, args=args))
+        text = f"Here is what I found: {prompt[-200:]}"
+        if not stream:
+            time.sleep(LATENCY["llm"])
+            return _Response(prompt_tokens, text=text)
+        return self._stream(prompt_tokens, text)
+
+    def _stream(self, prompt_tokens, text):
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)]
+        for piece in pieces:
+            time.sleep(LATENCY["llm"] / len(pieces))
+            yield _Response(prompt_tokens, text=piece)
+
+
+class FakeQdrantClient:
+    """In-memory QdrantClient with the subset of the API embedding.py and QdrantStore use."""
+
+    def __init__(self, *args, **kwargs):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def _call(self):
+        time.sleep(LATENCY["vector"])
+
+    def get_collections(self):
+        self._call()
+        return SimpleNamespace(collections=[SimpleNamespace(name=n) for n in self._collections])
+
+    def get_collection(self, collection_name):
+        self._call()
+        size = self._collections[collection_name]["dim"]
+        return SimpleNamespace(config=SimpleNamespace(params=SimpleNamespace(vectors=SimpleNamespace(size=size))))
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        self._call()
+        with self._lock:
+            self._collections[collection_name] = {"dim": vectors_config.size, "points": {}, "matrix": None}
+
+    recreate_collection = create_collection
+
+    def delete_collection(self, collection_name, **kwargs):
+        self._call()
+        with self._lock:
+            self._collections.pop(collection_name, None)
+
+    def create_payload_index(self, *args, **kwargs):
+        self._call()
+
+    def upsert(self, collection_name, points, **kwargs):
+        self._call()
+        with self._lock:
+            collection = self._collections[collection_name]
+            for p in points:
+                vector = np.asarray(p.vector, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                collection["points"][str(p.id)] = (vector / norm if norm else vector, p.payload or {})
+            collection["matrix"] = None
+
+    @staticmethod
+    def _matches(payload, flt):
+        return flt is None or all(payload.get(c.key) == c.match.value for c in flt.must)
+
+    def search(self, collection_name, query_vector, limit=10, query_filter=None, **kwargs):
+        self._call()
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if not collection or not collection["points"]:
+                return []
+            if collection["matrix"] is None:
+                ids = list(collection["points"])
+                payloads = [collection["points"][i][1] for i in ids]
+                collection["matrix"] = (ids, payloads, np.stack([collection["points"][i][0] for i in ids]))
+            ids, payloads, matrix = collection["matrix"]
+        scores = matrix @ np.asarray(query_vector, dtype=np.float32)
+        hits = []
+        for i in np.argsort(-scores):
+            payload = payloads[i]
+            if self._matches(payload, query_filter):
+                hits.append(SimpleNamespace(id=ids[i], score=float(scores[i]), payload=payload))
+                if len(hits) == limit:
+                    break
+        return hits
+
+    def scroll(self, collection_name, scroll_filter=None, limit=10, **kwargs):
+        self._call()
+        with self._lock:
+            points = self._collections.get(collection_name, {}).get("points", {})
+            found = [SimpleNamespace(id=i, payload=p) for i, (_, p) in points.items() if self._matches(p, scroll_filter)]
+        return found[:limit], None
+
+    def retrieve(self, collection_name, ids, **kwargs):
+        self._call()
+        with self._lock:
+            points = self._collections.get(collection_name, {}).get("points", {})
+            return [SimpleNamespace(id=str(i), payload=points[str(i)][1]) for i in ids if str(i) in points]
+
+    def delete(self, collection_name, points_selector, **kwargs):
+        self._call()
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if not collection:
+                return
+            if hasattr(points_selector, "points"):
+                doomed = [str(i) for i in points_selector.points]
+            else:
+                doomed = [i for i, (_, p) in collection["points"].items() if self._matches(p, points_selector.filter)]
+            for i in doomed:
+                collection["points"].pop(i, None)
+            collection["matrix"] = None
+
+
+def install_fakes():
+    """Patch the provider SDKs before any backend module imports them."""
+    import google.generativeai as genai
+    import qdrant_client
+
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.embed_content = fake_embed_content
+    qdrant_client.QdrantClient = FakeQdrantClient
+
+
+# -- instrumentation ---------------------------------------------------------
+
+
+class StageTimer:
+    """Wraps functions in place and records their wall time per stage."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap(self, owner, attr, stage):
+        fn = getattr(owner, attr)
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - start)
+
+        setattr(owner, attr, timed)
+
+    def reset(self):
+        self.samples.clear()
+
+
+def instrument(timer):
+    from backend import columnar, dispatcher, embedding, main
+
+    timer.wrap(main.fast_router, "fast_route", "fast route")
+    timer.wrap(main.query_cache, "lookup", "cache")
+    timer.wrap(main, "route_query", "decide")
+    timer.wrap(main, "run_function", "dispatch")
+    timer.wrap(dispatcher, "get_selected_columns", "sql")
+    timer.wrap(columnar, "aggregate", "sql")
+    timer.wrap(embedding, "retrieve", "retrieval")
+    timer.wrap(main, "render_result", "render")
+    timer.wrap(main, "format_result", "format (llm)")
+    timer.wrap(main.sql_handler, "load_csv_to_sqlite", "upload: load table")
+    timer.wrap(embedding, "index_document", "upload: index document")
+    timer.wrap(embedding, "embed_content", "embed call")
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarize(label, samples):
+    ms = [s * 1000 for s in samples]
+    return (f"  {label:<26} {len(ms):>6} {statistics.mean(ms):>9.1f} {percentile(ms, 50):>9.1f} "
+            f"{percentile(ms, 95):>9.1f} {percentile(ms, 99):>9.1f}")
+
+
+def print_table(title, series):
+    report(f"{title}\n  {'stage':<26} {'n':>6} {'mean ms':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for label, samples in series.items():
+        if samples:
+            report(summarize(label, samples))
+
+
+class Memory:
+    """Peak RSS (always) and Python heap peak (with tracemalloc) per phase."""
+
+    def __init__(self, trace):
+        self.trace = trace
+        if trace:
+            tracemalloc.start()
+
+    def start_phase(self):
+        if self.trace:
+            tracemalloc.reset_peak()
+
+    def report(self, phase):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        heap = f", python heap peak {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MB" if self.trace else ""
+        report(f"  memory after {phase}: peak RSS {rss:.1f} MB{heap}")
+
+
+# -- workload ----------------------------------------------------------------
+
+
+def write_sales_csv(path, n):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows(n))
+
+
+def write_policy_docx(path, sections):
+    """A policy manual with numbered sections; returns (question, fact) pairs answerable from it."""
+    from docx import Document
+
+    pages, questions = build_corpus(sections)
+    document = Document()
+    for page in pages:
+        for block in page.split("\n"):
+            block = block.strip()
+            if re.match(r"^\d+\. ", block):
+                document.add_heading(block, level=1)
+            elif block:
+                document.add_paragraph(block)
+    document.save(path)
+    return questions
+
+
+def workload(questions):
+    """(query, function name, arguments) the scripted decision model answers with."""
+    sum_price = [{"operation": "SUM", "column": "Total Price"}]
+    queries = [
+        ("What is the total sales amount by category?", "get_order_details",
+         {"table_name": "sales", "aggregations": sum_price, "group_by": ["Category"]}),
+        ("Show monthly revenue per category for 2024", "get_order_details",
+         {"table_name": "sales", "aggregations": sum_price,
+          "group_by": ["Category", "strftime('%Y-%m', \"Sale Date\")"],
+          "whereClause": "strftime('%Y', \"Sale Date\") = '2024'"}),
+        ("How many orders were placed on July 4th?", "get_order_details",
+         {"table_name": "sales", "aggregations": [{"operation": "COUNT", "column": "*"}],
+          "whereClause": "strftime('%m-%d', \"Sale Date\") = '07-04'"}),
+        ("What is the average order value by payment method?", "get_order_details",
+         {"table_name": "sales", "aggregations": [{"operation": "AVG", "column": "Total Price"}],
+          "group_by": ["Payment Method"]}),
+        ("List UPI orders from India on 2024-03-15", "get_order_details",
+         {"table_name": "sales", "columns": ["Order ID", "Category", "Quantity", "Total Price"],
+          "whereClause": {"Payment Method": "UPI", "Country": "India", "Sale Date": "2024-03-15"}}),
+        ("Show me the details of order ORD42", "get_order_details",
+         {"table_name": "sales", "columns": [], "whereClause": {"Order ID": "ORD42"}}),
+    ]
+    for question, _ in questions[:3]:
+        queries.append((question, "get_policy_info", {"query": question}))
+    return queries
+
+
+# -- driver ------------------------------------------------------------------
+
+
+async def upload(client, path):
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        response = await client.post("/upload", files={"file": (os.path.basename(path), f)})
+    response.raise_for_status()
+    job_id = response.json().get("job_id")
+    while job_id:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] in ("done", "failed"):
+            if job["status"] == "failed":
+                raise RuntimeError(f"Upload of {path} failed: {job['error']}")
+            break
+        await asyncio.sleep(0.02)
+    return time.perf_counter() - start
+
+
+async def ask(client, query, llm_format):
+    start = time.perf_counter()
+    response = await client.post("/query", data={"query": query, "llm_format": str(llm_format).lower()})
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/query {query!r} -> {response.status_code}: {response.text[:200]}")
+    return elapsed
+
+
+def clear_answer_caches():
+    from backend.aggregate_cache import aggregate_cache
+    from backend.query_cache import query_cache
+
+    query_cache.invalidate("benchmark")
+    aggregate_cache.clear()
+
+
+class caches_disabled:
+    """Make every request miss the answer and aggregate caches (the uncached throughput run)."""
+
+    def __enter__(self):
+        from backend import aggregate_cache, main
+
+        self._lookup, self._enabled = main.query_cache.lookup, aggregate_cache.AGG_CACHE_ENABLED
+        main.query_cache.lookup = lambda query, semantic=True, llm_format=False: None
+        aggregate_cache.AGG_CACHE_ENABLED = False
+
+    def __exit__(self, *exc):
+        from backend import aggregate_cache, main
+
+        main.query_cache.lookup = self._lookup
+        aggregate_cache.AGG_CACHE_ENABLED = self._enabled
+
+
+async def throughput(client, queries, total, concurrency, llm_format):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            latencies.append(await ask(client, queries[i % len(queries)][0], llm_format))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return total / (time.perf_counter() - start), latencies
+
+
+async def run_scale(client, timer, memory, scale, args):
+    from backend import main
+
+    config = SCALES[scale]
+    report(f"\n=== {scale}: {config['rows']:,} sales rows, {config['sections']} policy sections ===")
+    await client.post("/reset")
+    main.startup_event()
+
+    csv_path = os.path.join("inputs", "sales.csv")
+    docx_path = os.path.join("inputs", f"policies_{scale}.docx")
+    os.makedirs("inputs", exist_ok=True)
+    write_sales_csv(csv_path, config["rows"])
+    questions = write_policy_docx(docx_path, config["sections"])
+    queries = workload(questions)
+    FakeGenerativeModel.decisions = {q: (name, a) for q, name, a in queries}
+
+    timer.reset()
+    memory.start_phase()
+    table_s = await upload(client, csv_path)
+    doc_s = await upload(client, docx_path)
+    report(f"  upload sales.csv: {table_s:.2f}s ({config['rows'] / table_s:,.0f} rows/s); "
+          f"policies.docx: {doc_s:.2f}s")
+    print_table("  upload stages", dict(timer.samples))
+    memory.report("upload")
+
+    timer.reset()
+    memory.start_phase()
+    cold = defaultdict(list)
+    for _ in range(args.repeat):
+        for query, name, _ in queries:
+            clear_answer_caches()
+            cold[name].append(await ask(client, query, args.llm_format))
+    print_table("  cold requests (caches emptied before each request)",
+                {**{f"request: {k}": v for k, v in cold.items()}, **timer.samples})
+    memory.report("cold queries")
+
+    for query, _, _ in queries:
+        await ask(client, query, args.llm_format)
+    timer.reset()
+    warm = [await ask(client, query, args.llm_format) for _ in range(args.repeat) for query, _, _ in queries]
+    print_table("  warm requests (answer cache populated)", {"request": warm, **timer.samples})
+
+    for label, context in (("uncached", caches_disabled()), ("cached", None)):
+        memory.start_phase()
+        if context:
+            with context:
+                rate, latencies = await throughput(client, queries, args.requests, args.concurrency, args.llm_format)
+        else:
+            rate, latencies = await throughput(client, queries, args.requests, args.concurrency, args.llm_format)
+        report(f"  throughput ({label}, concurrency {args.concurrency}): {rate:.1f} req/s, "
+              f"p50 {percentile(latencies, 50) * 1000:.1f} ms, p95 {percentile(latencies, 95) * 1000:.1f} ms")
+        memory.report(f"{label} throughput")
+
+
+async def run(args):
+    import httpx
+
+    from backend import main
+
+    timer = StageTimer()
+    instrument(timer)
+    memory = Memory(args.tracemalloc)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scale in args.scales.split(","):
+            await run_scale(client, timer, memory, scale.strip(), args)
+    main.shutdown_event()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated, from {sorted(SCALES)}")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--embed-latency-ms", type=float, default=50)
+    parser.add_argument("--vector-latency-ms", type=float, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llm-format", action="store_true", help="format every answer with the (fake) LLM")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report Python heap peaks (slower)")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+    args = parser.parse_args()
+
+    LATENCY.update(llm=args.llm_latency_ms / 1000, embed=args.embed_latency_ms / 1000,
+                   vector=args.vector_latency_ms / 1000)
+    os.environ.setdefault("PROMPT_CACHE_ENABLED", "0")
+    os.environ["VECTOR_STORE"] = "qdrant"
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.chdir(workdir)
+    report(f"Working directory: {workdir}")
+    report(f"Simulated latency: llm {args.llm_latency_ms:g} ms, embed {args.embed_latency_ms:g} ms, "
+          f"vector {args.vector_latency_ms:g} ms")
+
+    install_fakes()
+    import backend.main  # noqa: F401  (configures logging)
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        sys.stdout = open(os.devnull, "w")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare per-query sqlite3.connect() against the pooled connections in backend.db_pool.
+
+Usage: python -m benchmarks.bench_sql_pool [--rows 50000] [--queries 5000] [--threads 8]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.db_pool import ConnectionPool
+
+QUERY = 'SELECT "Total Price" FROM sales WHERE "Order ID" = ? COLLATE NOCASE'
+
+
+def build_db(path, rows):
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE sales ("Order ID" TEXT, "Total Price" INTEGER)')
+        conn.executemany(
+            "INSERT INTO sales VALUES (?, ?)",
+            ((f"ORD{i}", random.randint(1, 5000)) for i in range(rows)),
+        )
+        conn.execute('CREATE INDEX idx_sales_order ON sales("Order ID" COLLATE NOCASE)')
+
+
+def run(label, worker, queries, threads):
+    ids = [f"ORD{random.randrange(queries)}" for _ in range(queries)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, ids))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<18} {queries / elapsed:>10.0f} qps  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_db(path, args.rows)
+
+        def fresh_connection(order_id):
+            with sqlite3.connect(path) as conn:
+                return conn.execute(QUERY, (order_id,)).fetchall()
+
+        pool = ConnectionPool(path, size=args.threads)
+
+        def pooled_connection(order_id):
+            with pool.connection() as conn:
+                return conn.execute(QUERY, (order_id,)).fetchall()
+
+        run("fresh connect", fresh_connection, args.queries, args.threads)
+        run("connection pool", pooled_connection, args.queries, args.threads)
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Search latency of the local memory-mapped vector store, optionally against Qdrant.
+
+Usage: python -m benchmarks.bench_vector_store [--points 20000] [--dim 3072] [--queries 200] [--qdrant]
+
+--qdrant uses QDRANT_URL / QDRANT_API_KEY and a throwaway collection.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from backend.vector_store import LocalVectorStore, QdrantStore
+
+
+def timed_searches(store, queries, limit):
+    start = time.perf_counter()
+    for q in queries:
+        store.search(q, limit=limit)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--qdrant", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.points, args.dim), dtype=np.float32)
+    queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+    ids = [str(uuid.uuid4()) for _ in range(args.points)]
+    payloads = [{"text": f"chunk {i}", "file_name": f"doc{i % 10}.pdf"} for i in range(args.points)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local = LocalVectorStore(root=tmp, collection_name="bench")
+        start = time.perf_counter()
+        for i in range(0, args.points, 1000):
+            local.upsert(ids[i:i + 1000], vectors[i:i + 1000], payloads[i:i + 1000])
+        print(f"local   upsert {args.points} x {args.dim}: {time.perf_counter() - start:.2f}s")
+        print(f"local   search: {timed_searches(local, queries, args.limit):.2f} ms/query")
+        start = time.perf_counter()
+        local.search_batch(queries, limit=args.limit)
+        print(f"local   batched search: {(time.perf_counter() - start) / len(queries) * 1000:.2f} ms/query")
+
+    if args.qdrant:
+        from qdrant_client import QdrantClient
+        from backend.embedding import ensure_collection_exists  # noqa: F401  (loads .env)
+
+        client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=30.0)
+        name = f"bench_{uuid.uuid4().hex[:8]}"
+        remote = QdrantStore(client, name)
+        try:
+            from qdrant_client.models import Distance, VectorParams
+            client.create_collection(name, vectors_config=VectorParams(size=args.dim, distance=Distance.COSINE))
+            for i in range(0, args.points, 256):
+                remote.upsert(ids[i:i + 256], vectors[i:i + 256].tolist(), payloads[i:i + 256])
+            print(f"qdrant  search: {timed_searches(remote, queries, args.limit):.2f} ms/query")
+        finally:
+            client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,12 @@ import streamlit as st
 import requests
 import json
 import os
+import time
 
 st.set_page_config(page_title="AI Chatbot", layout="centered")
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8001")
+POLL_INTERVAL = 1.0
 
 def safe_json(response):
     try:
@@ -20,10 +22,60 @@ if st.button("Reset Data"):
     response = requests.post(f"{BACKEND_URL}/reset")
     st.success(response.json().get("message", "Data reset."))
 
+def iter_sse(response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def stream_query(query):
+    st.subheader("Query Result:")
+    status = st.empty()
+    answer = st.empty()
+    rows = []
+    table = None
+    text = ""
+    status.caption("Thinking...")
+    with requests.post(f"{BACKEND_URL}/query/stream", data={"query": query}, stream=True) as res:
+        for event, data in iter_sse(res):
+            if event == "decision":
+                status.caption(f"Using {data.get('name', 'tool')}{' (cached)' if data.get('cached') else ''}...")
+            elif event == "rows":
+                rows.extend(data.get("rows", []))
+                if table is None:
+                    table = st.empty()
+                with table.container():
+                    with st.expander(f"Raw rows ({len(rows)})"):
+                        st.dataframe(pd.DataFrame(rows))
+            elif event == "token":
+                text += data.get("text", "")
+                answer.markdown(text)
+            elif event == "answer":
+                answer.markdown(data.get("response", ""))
+            elif event == "error":
+                st.error(data.get("error", "Unexpected error occurred"))
+            elif event == "done":
+                break
+    status.empty()
+
+
 query = st.text_input("Ask a question")
+stream = st.checkbox("Stream response", value=True)
 if st.button("Submit"):
     if not query.strip():
         st.error("Please enter a question before submitting.")
+    elif stream:
+        stream_query(query)
     else:
         with st.spinner("Thinking..."):
             res = requests.post(f"{BACKEND_URL}/query", data={"query": query})
@@ -54,7 +106,25 @@ if uploaded:
         res = requests.post(f"{BACKEND_URL}/upload", files=files)
         data = safe_json(res)
 
-        if "message" in data:
-            st.success(data["message"])
-        else:
-            st.error(data.get("error", "Upload failed."))
+    if "job_id" in data:
+        job_id = data["job_id"]
+        st.info(data.get("message", "Processing upload..."))
+        progress = st.progress(0.0, text="Queued")
+        while True:
+            job = safe_json(requests.get(f"{BACKEND_URL}/jobs/{job_id}"))
+            if "error" in job and "status" not in job:
+                st.error(job["error"])
+                break
+            progress.progress(job.get("progress", 0.0), text=job.get("stage", "").capitalize())
+            if job.get("status") == "done":
+                st.success(job.get("message") or "File processed successfully.")
+                break
+            if job.get("status") == "failed":
+                st.error(job.get("error") or "Upload failed.")
+                break
+            time.sleep(POLL_INTERVAL)
+
+    elif "message" in data:
+        st.success(data["message"])
+    else:
+        st.error(data.get("error", "Upload failed."))